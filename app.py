@@ -1,10 +1,11 @@
 import os
 import requests
 import json
-from flask import Flask, request, jsonify, render_template, send_from_directory, make_response, send_file
+from flask import Flask, request, jsonify, render_template, send_from_directory, make_response, send_file, Response
 import base64
 from google.cloud import storage
-from convert_to_docs import MarkdownToDocxConverter # MarkdownToDocxConverter 임포트
+from convert_to_docs import MarkdownToDocxConverter, MemoryLimitExceeded # MarkdownToDocxConverter 임포트
+from draft_store import DraftStore, DraftError, DraftNotFound, DraftConflict, DraftTooLarge, DraftStorageFull
 from google import genai
 from PIL import Image
 import io
@@ -23,7 +24,7 @@ app = Flask(__name__,
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-    response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+    response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
     # 캐시 관련 헤더 추가
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
@@ -41,6 +42,9 @@ def serve_static(filename):
 # GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 GIST_API_URL = 'https://api.github.com/gists'
 
+# 마크다운 편집기 임시 저장소 (DRAFT_STORAGE_DIR 환경 변수로 위치 지정)
+draft_store = DraftStore()
+
 @app.route('/')
 def index():
     """Serves the main HTML page."""
@@ -217,25 +221,106 @@ def convert_markdown_to_docx_route():
         return jsonify({'error': '마크다운 텍스트가 필요합니다.'}), 400
 
     try:
+        # 이미지는 한 장씩 처리되어 임시 파일로 내려가고, zip 패키지는 응답으로 바로 스트리밍됨
+        # 모든 변환이 함께 쓰는 메모리 상한(본문 + 임시 저장 이미지 누적 크기)은 DOCX_MEMORY_LIMIT_MB 환경 변수로 설정
         converter = MarkdownToDocxConverter()
-        # output_path=None으로 설정하여 BytesIO 객체를 반환받음
-        docx_buffer = converter.convert_markdown_to_docx(markdown_text, output_path=None, save_images_to_disk=save_images_to_disk)
-
-        if docx_buffer:
-            return send_file(
-                docx_buffer,
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                as_attachment=True,
-                download_name='document.docx'
-            )
-        else:
-            return jsonify({'error': 'DOCX 변환에 실패했습니다.'}), 500
+        docx_chunks = converter.stream_markdown_to_docx(markdown_text, save_images_to_disk=save_images_to_disk)
+
+        response = Response(
+            docx_chunks,
+            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            headers={'Content-Disposition': 'attachment; filename=document.docx'}
+        )
+        # 전송이 시작되기 전에 응답이 닫혀도 임시 파일과 메모리 예산이 정리되도록 함
+        response.call_on_close(converter.cleanup)
+        return response
 
+    except MemoryLimitExceeded as e:
+        return jsonify({'error': f'문서가 너무 큽니다: {str(e)}'}), 413
     except Exception as e:
         import traceback
         print(f"Markdown to DOCX 변환 중 오류 발생: {traceback.format_exc()}")
         return jsonify({'error': f'서버 오류 발생: {str(e)}'}), 500
 
+@app.route('/drafts/<draft_id>', methods=['GET'])
+def get_draft(draft_id):
+    """임시 저장된 마크다운 초안을 복원하는 엔드포인트"""
+    try:
+        draft = draft_store.get(draft_id)
+        return jsonify({
+            'draft_id': draft_id,
+            'version': draft['version'],
+            'title': draft.get('title'),
+            'updated_at': draft.get('updated_at'),
+            'content': draft['content'],
+        })
+
+    except DraftNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except DraftError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/drafts/<draft_id>', methods=['PUT'])
+def put_draft(draft_id):
+    """초안 전체를 저장하는 엔드포인트 (첫 저장 또는 버전 충돌 후 재동기화)"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON 객체 형식의 요청 본문이 필요합니다.'}), 400
+    content = data.get('content')
+    if not isinstance(content, str):
+        return jsonify({'error': '초안 내용이 필요합니다.'}), 400
+
+    try:
+        version = draft_store.put(draft_id, content, title=data.get('title'))
+        return jsonify({'version': version})
+    except DraftTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except DraftStorageFull as e:
+        return jsonify({'error': str(e)}), 507
+    except DraftError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/drafts/<draft_id>', methods=['PATCH'])
+def patch_draft(draft_id):
+    """초안의 변경분만 받아 저장하는 엔드포인트"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON 객체 형식의 요청 본문이 필요합니다.'}), 400
+    try:
+        base_version = int(data['base_version'])
+        start = int(data['start'])
+        delete_count = int(data['delete_count'])
+        insert = data.get('insert', '')
+        length = int(data['length'])
+        if not isinstance(insert, str):
+            raise TypeError('insert must be a string')
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': '변경분 형식이 올바르지 않습니다.'}), 400
+
+    try:
+        version = draft_store.apply_patch(draft_id, base_version, start, delete_count, insert, length, title=data.get('title'))
+        return jsonify({'version': version})
+    except DraftConflict as e:
+        # 클라이언트는 전체 내용을 PUT으로 다시 보내 동기화함
+        return jsonify({'error': str(e), 'version': e.version}), 409
+    except DraftNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except DraftTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except DraftStorageFull as e:
+        return jsonify({'error': str(e)}), 507
+    except DraftError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/drafts/<draft_id>', methods=['DELETE'])
+def delete_draft(draft_id):
+    """임시 저장된 초안을 삭제하는 엔드포인트"""
+    try:
+        draft_store.delete(draft_id)
+        return jsonify({'deleted': True})
+    except DraftError as e:
+        return jsonify({'error': str(e)}), 400
+
 if __name__ == '__main__':
     # Cloud Run이 제공하는 PORT 환경 변수 사용, 없으면 5000번 기본 사용
     port = int(os.environ.get("PORT", 5000))
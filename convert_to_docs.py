@@ -8,18 +8,30 @@ import argparse
 import re
 import requests
 import io
+import os
+import shutil
 import sys
+import tempfile
+import threading
+import zipfile
+from xml.sax.saxutils import escape
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 import logging
 
 try:
     from docx import Document
     from docx.shared import Inches, Pt
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.text.paragraph import Paragraph
     from docx.oxml.shared import OxmlElement, qn
     from docx.oxml.ns import nsdecls
     from docx.oxml import parse_xml
+    from docx.oxml.shape import CT_Inline
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI, PackURI
+    from docx.image.image import Image as DocxImage
+    from docx.parts.image import ImagePart
 except ImportError:
     print("Error: python-docx가 설치되지 않았습니다.")
     print("다음 명령어로 설치하세요: pip install python-docx")
@@ -36,147 +48,430 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 프로세스 전체의 DOCX 변환이 함께 쓰는 메모리 상한 (MB). Cloud Run 인스턴스 크기에 맞춰 조정합니다.
+# 동시에 진행 중인 모든 변환의 마크다운 본문 + 다운로드 중인 원본 + 디코딩 메모리 + 임시 저장된 PNG를 합산합니다.
+# (Cloud Run의 /tmp는 메모리에 올라가므로 임시 파일도 메모리 사용량으로 셈)
+DEFAULT_MEMORY_LIMIT_MB = int(os.environ.get('DOCX_MEMORY_LIMIT_MB', '128'))
+# 원격 이미지 다운로드 크기 상한
+MAX_IMAGE_DOWNLOAD_BYTES = 20 * 1024 * 1024
+# 스트리밍 응답으로 내보낼 청크 크기
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 블록 요소 패턴
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+BULLET_ITEM_PATTERN = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+NUMBER_ITEM_PATTERN = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+HORIZONTAL_RULE_PATTERN = re.compile(r'^(\*\s*){3,}$|^(-\s*){3,}$|^(_\s*){3,}$')
+# 인라인 패턴: ***굵게+기울임***, ___굵게+기울임___, **굵게**, __굵게__, ~~취소선~~, `코드`, [링크](url), *기울임*, _기울임_
+INLINE_PATTERN = re.compile(
+    r'\*\*\*(.+?)\*\*\*|___(.+?)___|\*\*(.+?)\*\*|__(.+?)__|~~(.+?)~~|`([^`]+)`|\[([^\]]+)\]\(([^)]+)\)|\*([^*\s][^*]*?)\*|(?<![\w])_([^_\s][^_]*?)_(?![\w])'
+)
+# 백슬래시로 이스케이프한 문장 부호 (\* 등). 파싱하는 동안 사용자 영역 문자로 바꿔 서식 기호로 읽히지 않게 함
+INLINE_ESCAPE_PATTERN = re.compile(r'\\([!-/:-@\[-`{-~])')
+INLINE_ESCAPE_BASE = 0xE000
+INLINE_ESCAPED_PATTERN = re.compile('[\uE021-\uE07E]')
+# 제어 문자는 XML에 넣을 수 없으므로 제거
+XML_INVALID_CHARS_PATTERN = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# 리스트 단계별 스타일 (기본 템플릿에 포함된 스타일)
+BULLET_LIST_STYLES = ['List Bullet', 'List Bullet 2', 'List Bullet 3']
+NUMBER_LIST_STYLES = ['List Number', 'List Number 2', 'List Number 3']
+
+CODE_BLOCK_STYLE = 'Code Block'
+CODE_FONT = 'Consolas'
+CODE_SHADING = 'F3F4F6'
+TABLE_HEADER_SHADING = 'F2F2F2'
+HYPERLINK_COLOR = '0563C1'
+HEADING_STYLES = ['Heading 1', 'Heading 2', 'Heading 3', 'Heading 4']
+# 그림 캡션 글자 크기 (half-point, 10pt)
+CAPTION_FONT_SIZE = 20
+
+
+def _xml_text(text: str) -> str:
+    """w:t에 넣을 수 있도록 텍스트를 이스케이프합니다."""
+    return escape(XML_INVALID_CHARS_PATTERN.sub('', text))
+
+
+class MemoryLimitExceeded(Exception):
+    """변환 작업이 메모리 상한을 넘어설 때 발생하는 예외"""
+
+
+class MemoryBudget:
+    """여러 변환이 나눠 쓰는 메모리 예산 (스레드 안전)"""
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, size: int) -> bool:
+        """size만큼 예약합니다. 남은 예산이 부족하면 예약하지 않고 False를 반환합니다."""
+        with self._lock:
+            if self._used_bytes + size > self.limit_bytes:
+                return False
+            self._used_bytes += size
+            return True
+
+    def release(self, size: int):
+        with self._lock:
+            self._used_bytes = max(0, self._used_bytes - size)
+
+    def available(self) -> int:
+        with self._lock:
+            return max(0, self.limit_bytes - self._used_bytes)
+
+
+# gunicorn 스레드들이 동시에 변환해도 합계가 상한을 넘지 않도록 프로세스에 하나만 둠
+PROCESS_MEMORY_BUDGET = MemoryBudget(DEFAULT_MEMORY_LIMIT_MB * 1024 * 1024)
+
+
+class _SpooledImagePart(ImagePart):
+    """이미지 바이트를 임시 파일에 두고, 패키지를 저장할 때만 읽어오는 ImagePart"""
+
+    def __init__(self, partname: PackURI, content_type: str, spool_path: str, sha1: str):
+        super().__init__(partname, content_type, b'')
+        self.spool_path = spool_path
+        self._sha1 = sha1
+
+    @property
+    def blob(self) -> bytes:
+        with open(self.spool_path, 'rb') as f:
+            return f.read()
+
+    @property
+    def image(self) -> DocxImage:
+        # 기본 구현은 이미지 바이트를 캐시하므로, 필요할 때마다 파일에서 읽음
+        return DocxImage.from_blob(self.blob)
+
+    @property
+    def sha1(self) -> str:
+        return self._sha1
+
+
+class _ZipChunkSink:
+    """ZipFile이 쓰는 바이트를 모아 두었다가 청크 단위로 꺼내주는 쓰기 전용 스트림"""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def __len__(self) -> int:
+        return self._size
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        return data
+
 
 class MarkdownToDocxConverter:
     """마크다운을 DOCX로 변환하는 클래스"""
     
-    def __init__(self):
+    def __init__(self, memory_limit_mb: Optional[int] = None):
         self.doc = Document()
         self.image_counter = 0
+        # memory_limit_mb를 지정하면 이 변환만의 예산을, 아니면 프로세스 공용 예산을 사용
+        if memory_limit_mb:
+            self.memory_budget = MemoryBudget(memory_limit_mb * 1024 * 1024)
+        else:
+            self.memory_budget = PROCESS_MEMORY_BUDGET
+        # 처리된 PNG 이미지를 보관하는 임시 디렉터리 (cleanup()에서 삭제)
+        self._spool_dir = None
+        # 이미 처리한 이미지 URL -> (PNG 임시 파일 경로, 너비 인치) 캐시
+        self._processed_images = {}
+        # 이 변환이 예산에서 예약한 크기 (cleanup()에서 반환)
+        self._reserved_bytes = 0
+        # 다운로드 중이거나 처리 대기 중인 원본 이미지 크기 (원본 파일을 닫을 때 반환)
+        self._download_bytes = 0
+        # save_images_to_disk로 저장하는 원본 이미지 번호
+        self._saved_image_counter = 0
+        # 링크 URL -> 관계 ID 캐시
+        self._hyperlink_rel_ids = {}
+        # 본문 파트에 다음으로 붙일 관계 ID / 그림 ID 번호 (relate_to/next_id는 호출마다 전체를 훑음)
+        self._next_rel_number = 1
+        self._next_shape_id = None
+        # 이미지 파트 -> 관계 ID 캐시
+        self._image_rel_ids = {}
+        # 번호 스타일 이름 -> abstractNumId 캐시와 다음 numId (add_num은 호출마다 w:num 전체를 훑음)
+        self._abstract_num_ids = {}
+        self._next_num_id = None
+        # 스타일 이름 -> 스타일 ID 캐시 (python-docx의 이름 조회는 호출마다 스타일 전체를 훑음)
+        self._style_ids = {}
         
-    def download_image(self, image_url: str, timeout: int = 30) -> Optional[bytes]:
-        """원격 이미지를 다운로드합니다."""
+    def _get_spool_dir(self) -> str:
+        if self._spool_dir is None:
+            self._spool_dir = tempfile.mkdtemp(prefix='md2docx_')
+        return self._spool_dir
+
+    def cleanup(self):
+        """변환 중 생성한 임시 파일을 삭제합니다."""
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+        self._processed_images = {}
+        self._download_bytes = 0
+        self._release(self._reserved_bytes)
+
+    def _reserve(self, size: int) -> bool:
+        """메모리 예산에서 size만큼 예약합니다."""
+        if not self.memory_budget.try_reserve(size):
+            return False
+        self._reserved_bytes += size
+        return True
+
+    def _release(self, size: int):
+        size = min(size, self._reserved_bytes)
+        self._reserved_bytes -= size
+        self.memory_budget.release(size)
+
+    def _release_download(self):
+        """처리가 끝난 원본 이미지 파일의 예약을 반환합니다."""
+        self._release(self._download_bytes)
+        self._download_bytes = 0
+
+    def _remaining_bytes(self) -> int:
+        """메모리 예산에서 남은 크기를 반환합니다."""
+        return self.memory_budget.available()
+
+    def download_image_to_file(self, image_url: str, timeout: int = 30) -> Optional[tempfile.SpooledTemporaryFile]:
+        """원격 이미지를 청크 단위로 받아 임시 파일에 저장합니다.
+
+        응답 전체를 메모리에 올리지 않으며, 다운로드 크기 상한이나 메모리 예산을 넘으면 중단합니다.
+        받은 크기는 메모리 예산에 예약되며, 파일을 닫은 뒤 _release_download()로 반환해야 합니다.
+        """
+        self._release_download()
+        image_file = tempfile.SpooledTemporaryFile(max_size=STREAM_CHUNK_SIZE, dir=self._get_spool_dir())
         try:
             logger.info(f"이미지 다운로드 중: {image_url}")
             
-            # User-Agent 헤더 추가 (일부 서버에서 요구)
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(image_url, timeout=timeout, headers=headers)
-            response.raise_for_status()
-            
-            # Content-Type 헤더 확인
-            content_type = response.headers.get('Content-Type', '')
-            if not content_type.startswith('image/'):
-                logger.warning(f"이미지 Content-Type이 아님: {image_url} (Content-Type: {content_type})")
-                return None
-            
-            image_data = response.content
-            
-            # 이미지 크기 확인
-            if len(image_data) > 20 * 1024 * 1024:  # 20MB 제한
-                logger.warning(f"이미지가 너무 큽니다 (>{20*1024*1024} bytes): {image_url}")
-                return None
+            with requests.get(image_url, timeout=timeout, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                
+                content_type = response.headers.get('Content-Type', '')
+                if not content_type.startswith('image/'):
+                    logger.warning(f"이미지 Content-Type이 아님: {image_url} (Content-Type: {content_type})")
+                    image_file.close()
+                    return None
+                
+                size = 0
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > MAX_IMAGE_DOWNLOAD_BYTES:
+                        logger.warning(f"이미지가 너무 큽니다 (>{MAX_IMAGE_DOWNLOAD_BYTES} bytes): {image_url}")
+                        image_file.close()
+                        self._release_download()
+                        return None
+                    if not self._reserve(len(chunk)):
+                        logger.warning(f"이미지 다운로드가 메모리 예산을 초과합니다 ({size} bytes): {image_url}")
+                        image_file.close()
+                        self._release_download()
+                        return None
+                    self._download_bytes += len(chunk)
+                    image_file.write(chunk)
             
-            if not image_data:
+            if size == 0:
                 logger.warning(f"빈 이미지 데이터: {image_url}")
+                image_file.close()
+                self._release_download()
                 return None
-                
-            logger.info(f"이미지 다운로드 완료: {len(image_data)} bytes")
-            return image_data
+            
+            image_file.seek(0)
+            logger.info(f"이미지 다운로드 완료: {size} bytes")
+            return image_file
             
         except requests.exceptions.RequestException as e:
             logger.error(f"이미지 다운로드 실패: {image_url} - {str(e)}")
+            image_file.close()
+            self._release_download()
             return None
         except Exception as e:
             logger.error(f"이미지 처리 중 오류: {image_url} - {str(e)}")
+            image_file.close()
+            self._release_download()
             return None
-    
-    def add_image_to_doc(self, image_data: bytes, alt_text: str = "") -> bool:
-        """이미지를 DOCX 문서에 추가합니다."""
 
 
-        logger.debug(f"add_image_to_doc 호출 중: {alt_text}, {image_data}")
-        logger.debug(f"image_data 크기: {len(image_data)} bytes")
-        logger.debug(f"image_data 타입: {type(image_data)}")
+    def download_image(self, image_url: str, timeout: int = 30) -> Optional[bytes]:
+        """원격 이미지를 다운로드합니다."""
+        image_file = self.download_image_to_file(image_url, timeout=timeout)
+        if image_file is None:
+            return None
         try:
-            # 이미지 크기 조정 및 검증
-            try:
-                # DOCX 삽입을 위해 항상 새로운 스트림 생성
-                image_stream_for_docx_insertion = io.BytesIO(image_data)
+            with image_file:
+                return image_file.read()
+        finally:
+            self._release_download()
+    
+    def _fit_image_size(self, width: int, height: int) -> Tuple[float, float]:
+        """픽셀 크기를 DOCX 페이지에 맞는 인치 크기로 변환합니다."""
+        # 최대 너비 6인치로 제한 (DPI 96 기준)
+        max_width_inches = 6.0
+        dpi = 96  # 기본 DPI
+        
+        # 픽셀을 인치로 변환
+        width_inches = width / dpi
+        height_inches = height / dpi
+        
+        if width_inches > max_width_inches:
+            # 비율 유지하면서 크기 조정
+            scale_factor = max_width_inches / width_inches
+            new_width_inches = max_width_inches
+            new_height_inches = height_inches * scale_factor
+        else:
+            new_width_inches = width_inches
+            new_height_inches = height_inches
+        
+        # 최대 높이도 8인치로 제한
+        max_height_inches = 8.0
+        if new_height_inches > max_height_inches:
+            scale_factor = max_height_inches / new_height_inches
+            new_height_inches = max_height_inches
+            new_width_inches = new_width_inches * scale_factor
+        
+        return new_width_inches, new_height_inches
+    
+    def _estimate_decoded_bytes(self, img: Image.Image) -> int:
+        """이미지를 디코딩하고 RGB로 변환하는 데 필요한 메모리를 추정합니다."""
+        width, height = img.size
+        bands = len(img.getbands())
+        # 원본 디코딩 버퍼 + RGB 변환 버퍼
+        bytes_per_pixel = bands + 3
+        if img.mode == 'RGBA':
+            # 알파 합성 경로는 img.split()이 만드는 밴드별 버퍼도 함께 유지함
+            bytes_per_pixel += bands
+        return width * height * bytes_per_pixel
+    
+    def _process_image_to_png(self, image_stream, alt_text: str = "") -> Optional[Tuple[str, float]]:
+        """이미지를 RGB PNG로 변환하여 임시 파일에 저장합니다.
+
+        디코딩에 필요한 메모리는 변환하는 동안만 예산에 예약합니다. 남은 예산을 넘으면 JPEG는
+        축소 디코딩(draft)으로 낮추고, 그래도 넘거나 축소할 수 없는 형식이면 None을 반환합니다.
+        변환된 PNG는 cleanup()까지 예산에 남으며, 예산이 부족하면 None을 반환합니다.
+        반환값은 (PNG 임시 파일 경로, 삽입 너비 인치)입니다.
+        """
+        decode_reserved = 0
+        try:
+            with Image.open(image_stream) as img:
+                logger.info(f"DOCX 삽입용 원본 이미지 형식: {img.format}, 크기: {img.size}")
                 
-                with Image.open(image_stream_for_docx_insertion) as img:
-                    logger.info(f"DOCX 삽입용 원본 이미지 형식: {img.format}, 크기: {img.size}")
-                    
-                    # 이미지 모드 확인 및 변환 (PNG 저장을 위해)
-                    if img.mode == 'RGBA':
-                        # RGBA를 RGB로 변환 (흰색 배경에 합성)
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[-1])  # 알파 채널을 마스크로 사용
-                        img = background
-                        logger.info(f"DOCX 삽입용 이미지 모드 변환 완료: RGBA -> RGB (흰색 배경)")
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-                        logger.info(f"DOCX 삽입용 이미지 모드 변환 완료: {img.mode} -> RGB")
-                    
+                # 픽셀 데이터를 읽기 전에 메모리 사용량 확인 (Image.open은 헤더만 읽음)
+                budget = self._remaining_bytes()
+                estimated = self._estimate_decoded_bytes(img)
+                if estimated > budget and img.format == 'JPEG':
+                    scale = 1
                     width, height = img.size
-                    logger.info(f"최종 DOCX 삽입용 이미지 크기: {width}x{height} pixels, 모드: {img.mode}")
-                    
-                    # 최대 너비 6인치로 제한 (DPI 96 기준)
-                    max_width_inches = 6.0
-                    dpi = 96  # 기본 DPI
-                    
-                    # 픽셀을 인치로 변환
-                    width_inches = width / dpi
-                    height_inches = height / dpi
-                    
-                    if width_inches > max_width_inches:
-                        # 비율 유지하면서 크기 조정
-                        scale_factor = max_width_inches / width_inches
-                        new_width_inches = max_width_inches
-                        new_height_inches = height_inches * scale_factor
-                    else:
-                        new_width_inches = width_inches
-                        new_height_inches = height_inches
-                    
-                    # 최대 높이도 8인치로 제한
-                    max_height_inches = 8.0
-                    if new_height_inches > max_height_inches:
-                        scale_factor = max_height_inches / new_height_inches
-                        new_height_inches = max_height_inches
-                        new_width_inches = new_width_inches * scale_factor
-                    
-                    logger.info(f"조정된 DOCX 삽입용 이미지 크기: {new_width_inches:.2f}x{new_height_inches:.2f} inches")
-                    
-                    # 최종 이미지를 PNG 형식으로 변환하여 새로운 스트림에 저장
-                    final_image_stream = io.BytesIO()
-                    img.save(final_image_stream, format='PNG')
-                    final_image_stream.seek(0) # 스트림 커서를 처음으로 되돌림
-                    
-            except Exception as e:
-                logger.error(f"DOCX 삽입용 이미지 처리 실패: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
-                return False
+                    while scale < 8 and width * height * 6 // (scale * scale) > budget:
+                        scale *= 2
+                    img.draft('RGB', (width // scale, height // scale))
+                    estimated = self._estimate_decoded_bytes(img)
+                    logger.warning(f"메모리 상한으로 이미지 축소 디코딩: {width}x{height} -> {img.size}")
+                if not self._reserve(estimated):
+                    logger.warning(f"이미지 디코딩 메모리({estimated} bytes)가 남은 예산({budget} bytes)을 초과하여 생략합니다: {alt_text}")
+                    return None
+                decode_reserved = estimated
                 
-            # DOCX에 이미지 추가
-            paragraph = self.doc.add_paragraph()
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            # 빈 run 생성
-            run = paragraph.add_run()
-            
-            # 최종 이미지 스트림 크기 로깅
-            logger.info(f"DOCX에 추가할 PNG 이미지 스트림 크기: {final_image_stream.getbuffer().nbytes} bytes")
+                # 이미지 모드 확인 및 변환 (PNG 저장을 위해)
+                if img.mode == 'RGBA':
+                    # RGBA를 RGB로 변환 (흰색 배경에 합성)
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[-1])  # 알파 채널을 마스크로 사용
+                    img = background
+                    logger.info(f"DOCX 삽입용 이미지 모드 변환 완료: RGBA -> RGB (흰색 배경)")
+                elif img.mode != 'RGB':
+                    img = img.convert('RGB')
+                    logger.info(f"DOCX 삽입용 이미지 모드 변환 완료: {img.mode} -> RGB")
+                
+                width, height = img.size
+                logger.info(f"최종 DOCX 삽입용 이미지 크기: {width}x{height} pixels, 모드: {img.mode}")
+                
+                new_width_inches, new_height_inches = self._fit_image_size(width, height)
+                logger.info(f"조정된 DOCX 삽입용 이미지 크기: {new_width_inches:.2f}x{new_height_inches:.2f} inches")
+                
+                # 최종 이미지를 PNG 형식으로 임시 파일에 저장
+                fd, png_path = tempfile.mkstemp(suffix='.png', dir=self._get_spool_dir())
+                with os.fdopen(fd, 'wb') as png_file:
+                    img.save(png_file, format='PNG')
+                img.close()
+                
+                # 디코딩 버퍼는 해제되었으므로 예약을 PNG 크기로 바꿈
+                self._release(decode_reserved)
+                decode_reserved = 0
+                png_size = os.path.getsize(png_path)
+                if not self._reserve(png_size):
+                    os.remove(png_path)
+                    logger.warning(f"임시 저장 이미지 누적 크기가 메모리 상한({self.memory_budget.limit_bytes} bytes)을 초과하여 생략합니다: {alt_text}")
+                    return None
+                return png_path, new_width_inches
+                
+        except Exception as e:
+            logger.error(f"DOCX 삽입용 이미지 처리 실패: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            return None
+        finally:
+            self._release(decode_reserved)
+    
+    def _add_spooled_picture(self, run, png_path: str, width_inches: float):
+        """임시 파일의 PNG를 메모리에 상주시키지 않는 이미지 파트로 run에 추가합니다."""
+        package = self.doc.part.package
+        # 크기/해시만 얻고 이미지 바이트는 이 함수가 끝나면 해제됨 (파트는 파일 경로만 보관)
+        image = DocxImage.from_file(png_path)
+        
+        image_part = next((part for part in package.image_parts if part.sha1 == image.sha1), None)
+        if image_part is None:
+            partname = PackURI(f"/word/media/image{len(package.image_parts) + 1}.{image.ext}")
+            image_part = _SpooledImagePart(partname, image.content_type, png_path, image.sha1)
+            package.image_parts.append(image_part)
+        
+        rId = self._image_rel_ids.get(image_part)
+        if rId is None:
+            rId = self._image_rel_ids[image_part] = self._add_relationship(RT.IMAGE, image_part)
+        if self._next_shape_id is None:
+            self._next_shape_id = self.doc.part.next_id
+        cx, cy = image.scaled_dimensions(Inches(width_inches), None)
+        inline = CT_Inline.new_pic_inline(self._next_shape_id, rId, image.filename, cx, cy)
+        self._next_shape_id += 1
+        run._r.add_drawing(inline)
+    
+    def _add_image_caption(self, alt_text: str):
+        """그림 번호와 설명 캡션을 추가합니다."""
+        if alt_text:
+            caption = f"그림 {self.image_counter + 1}: {alt_text}"
+        else:
+            # alt_text가 없어도 그림 번호 추가
+            caption = f"그림 {self.image_counter + 1}"
+        self._add_centered_paragraph(
+            f'<w:r><w:rPr><w:i/><w:sz w:val="{CAPTION_FONT_SIZE}"/></w:rPr>'
+            f'<w:t xml:space="preserve">{_xml_text(caption)}</w:t></w:r>'
+        )
+    
+    def _add_placeholder(self, text: str):
+        """이미지 대신 가운데 정렬된 안내 문구를 추가합니다."""
+        self._add_centered_paragraph(f'<w:r><w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r>')
+    
+    def _insert_processed_image(self, png_path: str, width_inches: float, alt_text: str = "") -> bool:
+        """변환된 PNG 임시 파일을 DOCX 문서에 추가합니다."""
+        try:
+            # 빈 run 하나가 있는 가운데 정렬 문단
+            run = self._add_centered_paragraph('<w:r/>').runs[0]
             
-            run.add_picture(final_image_stream, width=Inches(new_width_inches))
+            logger.info(f"DOCX에 추가할 PNG 이미지 크기: {os.path.getsize(png_path)} bytes")
+            self._add_spooled_picture(run, png_path, width_inches)
             
-            # 이미지 설명 추가 (alt_text가 있는 경우)
-            if alt_text:
-                caption_paragraph = self.doc.add_paragraph()
-                caption_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                caption_run = caption_paragraph.add_run(f"그림 {self.image_counter + 1}: {alt_text}")
-                caption_run.font.size = Pt(10)
-                caption_run.font.italic = True
-            else:
-                # alt_text가 없어도 그림 번호 추가
-                caption_paragraph = self.doc.add_paragraph()
-                caption_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                caption_run = caption_paragraph.add_run(f"그림 {self.image_counter + 1}")
-                caption_run.font.size = Pt(10)
-                caption_run.font.italic = True
+            self._add_image_caption(alt_text)
             
             self.image_counter += 1
             logger.info(f"DOCX에 이미지 추가 완료: {alt_text or '이미지'}")
@@ -186,6 +481,16 @@ class MarkdownToDocxConverter:
             logger.error(f"이미지 추가 실패: {str(e)}")
             return False
     
+    def add_image_to_doc(self, image_data: bytes, alt_text: str = "") -> bool:
+        """이미지를 DOCX 문서에 추가합니다."""
+        logger.debug(f"add_image_to_doc 호출 중: {alt_text}")
+        logger.debug(f"image_data 크기: {len(image_data)} bytes")
+        processed = self._process_image_to_png(io.BytesIO(image_data), alt_text)
+        if processed is None:
+            return False
+        png_path, width_inches = processed
+        return self._insert_processed_image(png_path, width_inches, alt_text)
+    
     def parse_markdown_images(self, markdown_text: str) -> List[Tuple[str, str]]:
         """마크다운에서 이미지 URL을 추출합니다."""
         # 마크다운 이미지 패턴: ![alt text](url)
@@ -193,197 +498,563 @@ class MarkdownToDocxConverter:
         images = re.findall(image_pattern, markdown_text)
         return images
     
-    def convert_markdown_to_docx(self, markdown_text: str, output_path: str | None, save_images_to_disk: bool) -> Optional[io.BytesIO]:
-        """마크다운을 DOCX로 변환합니다.
-        output_path가 제공되면 파일로 저장하고, 그렇지 않으면 BytesIO 객체를 반환합니다.
-        """
+    def save_image_to_disk(self, image_file, image_id: int, alt_text: str = "") -> Optional[str]:
+        """다운로드된 이미지 원본을 downloaded_images 디렉터리에 저장합니다."""
+        os.makedirs("downloaded_images", exist_ok=True)
+        image_name = f"{image_id}"
         try:
-            # 이미지 URL 추출
-            images = self.parse_markdown_images(markdown_text)
-            logger.info(f"발견된 이미지 개수: {len(images)}")
-            
-            # 모든 이미지를 미리 다운로드
-            downloaded_images = {}
-            for alt_text, image_url in images:
-                logger.info(f"이미지 다운로드 시작: {alt_text} - {image_url}")
-                image_data = self.download_image(image_url)
-                if image_data:
-                    downloaded_images[image_url] = (image_data, alt_text)
-                    logger.info(f"이미지 다운로드 성공: {alt_text}")
-                else:
-                    logger.warning(f"이미지 다운로드 실패: {alt_text} - {image_url}")
+            file_extension = 'bin'  # 기본 확장자
             
-            logger.info(f"총 {len(downloaded_images)}개 이미지 다운로드 완료")
-            
-            # 다운로드된 이미지 파일을 로컬 디스크에 저장 (선택적)
-            if save_images_to_disk:
-                image_id = 0
-                image_name_list = []
-                import os
-                os.makedirs("downloaded_images", exist_ok=True)
-                
-                for image_url, (image_data, alt_text) in downloaded_images.items():
-                    try:
-                        # 이미지 이름 생성
-                        image_name = f"{image_id}"
-                        image_id += 1
-                        
-                        # 먼저 이미지 형식 확인을 위해 스트림 생성
-                        image_stream_for_format_check = io.BytesIO(image_data)
-                        
-                        file_extension = 'bin'  # 기본 확장자
-                        
-                        # 이미지 형식 확인
-                        try:
-                            with Image.open(image_stream_for_format_check) as img:
-                                original_format = img.format
-                                logger.info(f"저장할 이미지 형식: {original_format}, 크기: {img.size}")
-                                
-                                # 원본 형식에 따라 확장자 결정
-                                if original_format in ['JPEG', 'JPG']:
-                                    file_extension = 'jpg'
-                                elif original_format == 'PNG':
-                                    file_extension = 'png'
-                                elif original_format == 'GIF':
-                                    file_extension = 'gif'
-                                elif original_format == 'BMP':
-                                    file_extension = 'bmp'
-                                elif original_format == 'TIFF':
-                                    file_extension = 'tiff'
-                                elif original_format == 'WEBP':
-                                    file_extension = 'webp'
-                                # 지원하지 않는 형식은 기본값 'bin' 유지
-                                
-                        except Exception as format_error:
-                            # stack trace
-                            import traceback
-                            print(traceback.format_exc())
-                            logger.warning(f"이미지 형식 확인 실패: {str(format_error)}, 기본 확장자 사용")
-                            file_extension = 'bin'
-                            
-                            # Image.open 실패 시 임시 파일로 저장하여 수동 검증
-                            try:
-                                temp_filename = f"downloaded_images/{image_name}_unidentified.bin"
-                                with open(temp_filename, "wb") as f:
-                                    f.write(image_data)
-                                logger.error(f"식별 실패 이미지 임시 저장: {temp_filename} (수동 확인 필요)")
-                            except Exception as e_temp:
-                                logger.error(f"임시 파일 저장 실패: {str(e_temp)}")
-                        
-                        # 원본 데이터를 그대로 저장 (가장 안전한 방법)
-                        filename = f"downloaded_images/{image_name}.{file_extension}"
-                        with open(filename, "wb") as f:
-                            f.write(image_data)
-                        image_name_list.append(filename)
-                        logger.info(f"이미지 저장 완료: {filename} (원본 데이터)")
-                            
-                    except Exception as e:
-                        logger.error(f"이미지 저장 실패: {alt_text} - {str(e)}")
-                        # 실패한 경우에도 시도
-                        try:
-                            image_name = f"{image_id}_error"
-                            image_id += 1
-                            filename = f"downloaded_images/{image_name}.bin"
-                            with open(filename, "wb") as f:
-                                f.write(image_data)
-                            image_name_list.append(filename)
-                            logger.warning(f"에러 파일로 저장: {filename}")
-                        except Exception as e2:
-                            logger.error(f"에러 파일 저장도 실패: {str(e2)}")
-                
-                logger.info(f"총 {len(downloaded_images)}개 이미지 다운로드 완료, {len(image_name_list)}개 이미지 파일 저장 완료")
-            else:
-                logger.info("다운로드된 이미지 파일을 디스크에 저장하지 않습니다.")
-
-            # 파일을 한 줄씩 읽어서 처리
-            lines = markdown_text.split('\n') # 기존 로직 유지, 중복 제거
-            current_paragraph = None
-            
-            for line in lines:
-                line = line.strip()
-                logger.debug(f"처리 중인 라인: \"{line}\"")
-                
-                # 이미지 라인 처리 (re.search 사용)
-                image_match = re.search(r'!\[([^\]]*)\]\(([^)]+)\)', line)
-                
-                if image_match:
-                    logger.debug(f"이미지 패턴 감지됨 (re.search): {image_match.groups()}")
-                    alt_text, image_url = image_match.groups()
+            # 이미지 형식 확인
+            try:
+                with Image.open(image_file) as img:
+                    original_format = img.format
+                    logger.info(f"저장할 이미지 형식: {original_format}, 크기: {img.size}")
                     
-                    # 미리 다운로드된 이미지 사용
-                    if image_url in downloaded_images:
-                        image_data, original_alt_text = downloaded_images[image_url]
-                        # alt_text가 비어있으면 원본 alt_text 사용
-                        display_alt_text = alt_text if alt_text else original_alt_text
-                        logger.debug(f"add_image_to_doc 호출 중: {display_alt_text}, {image_url}")
-                        success = self.add_image_to_doc(image_data, display_alt_text)
-                        if not success:
-                            # 이미지 추가 실패 시 플레이스홀더
-                            placeholder_paragraph = self.doc.add_paragraph()
-                            placeholder_paragraph.add_run(f"[이미지 추가 실패: {display_alt_text}]")
-                            placeholder_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            logger.warning(f"DOCX에 이미지 추가 실패: {display_alt_text}")
-                    else:
-                        # 이미지 다운로드 실패 시 플레이스홀더 추가
-                        placeholder_paragraph = self.doc.add_paragraph()
-                        placeholder_paragraph.add_run(f"[이미지 로드 실패 (다운로드되지 않음): {image_url}]")
-                        placeholder_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        placeholder_paragraph.runs[0].font.color.rgb = None  # 빨간색으로 표시
-                        logger.warning(f"DOCX에 이미지 로드 실패 (다운로드되지 않음): {image_url}")
-                
-                # 헤딩 처리
-                elif line.startswith('#'):
-                    level = len(line) - len(line.lstrip('#'))
-                    text = line.lstrip('# ').strip()
+                    # 원본 형식에 따라 확장자 결정
+                    if original_format in ['JPEG', 'JPG']:
+                        file_extension = 'jpg'
+                    elif original_format == 'PNG':
+                        file_extension = 'png'
+                    elif original_format == 'GIF':
+                        file_extension = 'gif'
+                    elif original_format == 'BMP':
+                        file_extension = 'bmp'
+                    elif original_format == 'TIFF':
+                        file_extension = 'tiff'
+                    elif original_format == 'WEBP':
+                        file_extension = 'webp'
+                    # 지원하지 않는 형식은 기본값 'bin' 유지
                     
-                    if level == 1:
-                        heading = self.doc.add_heading(text, level=1)
-                    elif level == 2:
-                        heading = self.doc.add_heading(text, level=2)
-                    elif level == 3:
-                        heading = self.doc.add_heading(text, level=3)
-                    else:
-                        heading = self.doc.add_heading(text, level=4)
-                
-                # 리스트 처리
-                elif line.startswith('- ') or line.startswith('* '):
-                    if current_paragraph is None:
-                        current_paragraph = self.doc.add_paragraph()
-                    current_paragraph.add_run(line[2:].strip() + '\n')
-                
-                # 번호 리스트 처리
-                elif re.match(r'^\d+\.\s', line):
-                    if current_paragraph is None:
-                        current_paragraph = self.doc.add_paragraph()
-                    current_paragraph.add_run(line + '\n')
-                
-                # 인용문 처리
-                elif line.startswith('> '):
-                    if current_paragraph is None:
-                        current_paragraph = self.doc.add_paragraph()
-                    current_paragraph.add_run(line[2:].strip() + '\n')
-                    current_paragraph.style = 'Quote'
+            except Exception as format_error:
+                # stack trace
+                import traceback
+                print(traceback.format_exc())
+                logger.warning(f"이미지 형식 확인 실패: {str(format_error)}, 기본 확장자 사용")
+                file_extension = 'bin'
                 
-                # 코드 블록 처리
-                elif line.startswith('```'):
-                    if current_paragraph is None:
-                        current_paragraph = self.doc.add_paragraph()
-                    current_paragraph.add_run(line + '\n')
-                    current_paragraph.style = 'No Spacing'
+                # Image.open 실패 시 임시 파일로 저장하여 수동 검증
+                try:
+                    temp_filename = f"downloaded_images/{image_name}_unidentified.bin"
+                    image_file.seek(0)
+                    with open(temp_filename, "wb") as f:
+                        shutil.copyfileobj(image_file, f, STREAM_CHUNK_SIZE)
+                    logger.error(f"식별 실패 이미지 임시 저장: {temp_filename} (수동 확인 필요)")
+                except Exception as e_temp:
+                    logger.error(f"임시 파일 저장 실패: {str(e_temp)}")
+            
+            # 원본 데이터를 그대로 저장 (가장 안전한 방법)
+            filename = f"downloaded_images/{image_name}.{file_extension}"
+            image_file.seek(0)
+            with open(filename, "wb") as f:
+                shutil.copyfileobj(image_file, f, STREAM_CHUNK_SIZE)
+            logger.info(f"이미지 저장 완료: {filename} (원본 데이터)")
+            return filename
                 
-                # 일반 텍스트 처리
-                elif line:
-                    if current_paragraph is None:
-                        current_paragraph = self.doc.add_paragraph()
-                    
-                    # 인라인 포맷팅 처리
-                    text = self.process_inline_formatting(line)
-                    current_paragraph.add_run(text + '\n')
+        except Exception as e:
+            logger.error(f"이미지 저장 실패: {alt_text} - {str(e)}")
+            # 실패한 경우에도 시도
+            try:
+                filename = f"downloaded_images/{image_name}_error.bin"
+                image_file.seek(0)
+                with open(filename, "wb") as f:
+                    shutil.copyfileobj(image_file, f, STREAM_CHUNK_SIZE)
+                logger.warning(f"에러 파일로 저장: {filename}")
+                return filename
+            except Exception as e2:
+                logger.error(f"에러 파일 저장도 실패: {str(e2)}")
+                return None
+        finally:
+            image_file.seek(0)
+    
+    def _add_remote_image(self, image_url: str, alt_text: str, save_images_to_disk: bool):
+        """원격 이미지를 한 장씩 다운로드/변환하여 문서에 추가하고 원본 데이터는 바로 해제합니다."""
+        processed = self._processed_images.get(image_url)
+        if processed is None:
+            logger.info(f"이미지 다운로드 시작: {alt_text} - {image_url}")
+            image_file = self.download_image_to_file(image_url)
+            if image_file is None:
+                # 이미지 다운로드 실패 시 플레이스홀더 추가
+                self._add_placeholder(f"[이미지 로드 실패 (다운로드되지 않음): {image_url}]")
+                logger.warning(f"DOCX에 이미지 로드 실패 (다운로드되지 않음): {image_url}")
+                return
+            
+            # 원본 파일은 디코딩이 끝날 때까지 예산에 남아 있음
+            with image_file:
+                if save_images_to_disk:
+                    self.save_image_to_disk(image_file, self._saved_image_counter, alt_text)
+                    self._saved_image_counter += 1
+                processed = self._process_image_to_png(image_file, alt_text)
+            self._release_download()
+            if processed is None:
+                # 이미지 변환 실패 또는 메모리 상한 초과 시 플레이스홀더
+                self._add_placeholder(f"[이미지 추가 실패: {alt_text or image_url}]")
+                logger.warning(f"DOCX에 이미지 추가 실패: {alt_text or image_url}")
+                return
+            self._processed_images[image_url] = processed
+        
+        png_path, width_inches = processed
+        if not self._insert_processed_image(png_path, width_inches, alt_text):
+            self._add_placeholder(f"[이미지 추가 실패: {alt_text}]")
+            logger.warning(f"DOCX에 이미지 추가 실패: {alt_text}")
+    
+    def build_document(self, markdown_text: str, save_images_to_disk: bool = False):
+        """마크다운을 파싱하여 self.doc을 구성합니다.
+
+        이미지는 만나는 순서대로 한 장씩 처리되고, 변환된 PNG는 임시 파일에만 남습니다.
+        문단, 표, 코드 블록은 XML을 한 번에 만들어 본문에 삽입합니다.
+        """
+        markdown_bytes = len(markdown_text.encode('utf-8'))
+        if not self._reserve(markdown_bytes):
+            raise MemoryLimitExceeded(
+                f"마크다운 텍스트({markdown_bytes} bytes)가 남은 메모리 예산({self._remaining_bytes()} bytes)을 초과합니다.")
+        
+        logger.info(f"발견된 이미지 개수: {len(self.parse_markdown_images(markdown_text))}")
+        if not save_images_to_disk:
+            logger.info("다운로드된 이미지 파일을 디스크에 저장하지 않습니다.")
+        
+        # 파일을 한 줄씩 읽어서 처리
+        lines = markdown_text.split('\n')
+        current_paragraph = None
+        current_style = None
+        # 코드 블록 안에 있는 동안 원본 줄을 모음 (None이면 코드 블록 밖)
+        code_lines = None
+        # 현재 리스트의 단계별 들여쓰기 (리스트가 끝나면 비움)
+        list_indents = []
+        # 번호 리스트 단계별 numId (리스트가 끝나면 비워서 다음 리스트는 첫 항목 번호부터 다시 시작)
+        list_num_ids = {}
+        # 마지막 리스트 항목 문단 (들여쓴 줄이나 바로 이어지는 줄은 이 항목에 이어 붙임)
+        list_item_paragraph = None
+        
+        i = 0
+        while i < len(lines):
+            raw_line = lines[i].rstrip('\r')
+            line = raw_line.strip()
+            previous_blank = i > 0 and not lines[i - 1].strip()
+            i += 1
+            logger.debug(f"처리 중인 라인: \"{line}\"")
+            
+            # 코드 블록 처리
+            if code_lines is not None:
+                if line.startswith('```'):
+                    self._add_code_block(code_lines)
+                    code_lines = None
+                else:
+                    code_lines.append(raw_line)
+                continue
+            
+            if line.startswith('```'):
+                code_lines = []
+                current_paragraph = None
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+                continue
+            
+            # 표 처리: 헤더 행 다음 줄이 구분선(|---|:---:|)인 경우 (헤딩 줄은 표로 보지 않음)
+            if '|' in line and not line.startswith('#') and i < len(lines) and TABLE_SEPARATOR_PATTERN.match(lines[i].strip()) \
+                    and len(self._split_table_row(lines[i])) == len(self._split_table_row(line)):
+                header_cells = self._split_table_row(line)
+                alignments = [self._parse_table_alignment(cell) for cell in self._split_table_row(lines[i])]
+                i += 1
+                body_rows = []
+                while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                    body_rows.append(self._split_table_row(lines[i]))
+                    i += 1
+                self._add_table(header_cells, alignments, body_rows)
+                current_paragraph = None
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+                continue
+            
+            # 이미지 라인 처리 (re.search 사용)
+            image_match = re.search(r'!\[([^\]]*)\]\(([^)]+)\)', line)
+            bullet_match = BULLET_ITEM_PATTERN.match(raw_line)
+            number_match = NUMBER_ITEM_PATTERN.match(raw_line)
+            
+            if image_match:
+                logger.debug(f"이미지 패턴 감지됨 (re.search): {image_match.groups()}")
+                alt_text, image_url = image_match.groups()
+                self._add_remote_image(image_url, alt_text, save_images_to_disk)
+                current_paragraph = None
+            
+            # 헤딩 처리
+            elif line.startswith('#'):
+                level = len(line) - len(line.lstrip('#'))
+                text = line.lstrip('# ').strip()
                 
-                # 빈 줄 처리
+                self._add_styled_paragraph(HEADING_STYLES[min(level, len(HEADING_STYLES)) - 1], text)
+                current_paragraph = None
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+            
+            # 구분선 처리
+            elif HORIZONTAL_RULE_PATTERN.match(line):
+                self._add_horizontal_rule()
+                current_paragraph = None
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+            
+            # 리스트 처리
+            elif bullet_match:
+                indent, text = bullet_match.groups()
+                level = self._list_level(list_indents, indent)
+                list_item_paragraph = self._add_styled_paragraph(BULLET_LIST_STYLES[level], self._task_list_text(text))
+                current_paragraph = None
+            
+            # 번호 리스트 처리
+            elif number_match:
+                indent, number, text = number_match.groups()
+                level = self._list_level(list_indents, indent)
+                # 상위 항목으로 돌아오면 하위 번호 리스트는 새로 시작
+                for deeper_level in [l for l in list_num_ids if l > level]:
+                    del list_num_ids[deeper_level]
+                if level not in list_num_ids:
+                    # 리스트의 첫 항목 번호(예: "3.")부터 시작
+                    list_num_ids[level] = self._restart_numbering(NUMBER_LIST_STYLES[level], int(number))
+                list_item_paragraph = self._add_styled_paragraph(NUMBER_LIST_STYLES[level], text, num_id=list_num_ids[level])
+                current_paragraph = None
+            
+            # 인용문 처리
+            elif line.startswith('>'):
+                text = line[1:].strip()
+                if not text:
+                    # 빈 인용 줄은 인용 안의 문단 구분
+                    current_paragraph = None
+                elif current_paragraph is None or current_style != 'Quote':
+                    current_paragraph = self._add_styled_paragraph('Quote', text)
+                    current_style = 'Quote'
                 else:
-                    if current_paragraph is not None:
-                        current_paragraph = None
+                    current_paragraph.add_run().add_break()
+                    self._append_inline_runs(current_paragraph, text)
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+            
+            # 리스트 항목의 이어지는 줄 (들여쓴 줄, 또는 빈 줄 없이 바로 이어지는 줄)
+            elif line and list_item_paragraph is not None and (raw_line[:1].isspace() or not previous_blank):
+                list_item_paragraph.add_run().add_break()
+                self._append_inline_runs(list_item_paragraph, line)
+            
+            # 일반 텍스트 처리
+            elif line:
+                if current_paragraph is None or current_style is not None:
+                    current_paragraph = self._add_styled_paragraph(None, line)
+                    current_style = None
+                else:
+                    current_paragraph.add_run().add_break()
+                    # 인라인 포맷팅 처리
+                    self._append_inline_runs(current_paragraph, line)
+                list_indents, list_num_ids, list_item_paragraph = [], {}, None
+            
+            # 빈 줄 처리
+            else:
+                if current_paragraph is not None:
+                    current_paragraph = None
+        
+        # 닫히지 않은 코드 블록
+        if code_lines is not None:
+            self._add_code_block(code_lines)
+        
+        self._separate_adjacent_tables()
+    
+    def _list_level(self, list_indents: List[int], indent: str) -> int:
+        """리스트 항목의 들여쓰기를 앞 항목들과 비교하여 단계(0~2)를 구합니다.
+
+        2칸/4칸 들여쓰기를 모두 지원하도록 list_indents에 단계별 들여쓰기 폭을 쌓아 둡니다.
+        """
+        width = len(indent.replace('\t', '    '))
+        while list_indents and width < list_indents[-1]:
+            list_indents.pop()
+        if not list_indents or width > list_indents[-1]:
+            list_indents.append(width)
+        return min(len(list_indents) - 1, len(BULLET_LIST_STYLES) - 1)
+    
+    def _task_list_text(self, text: str) -> str:
+        """체크박스 리스트 항목(- [ ] / - [x])을 기호로 바꿉니다."""
+        if text.startswith('[ ] '):
+            return '☐ ' + text[4:]
+        if text[:4].lower() == '[x] ':
+            return '☑ ' + text[4:]
+        return text
+    
+    def _restart_numbering(self, style_name: str, start: int = 1) -> int:
+        """스타일의 번호 매기기를 start부터 다시 시작하는 새 numId를 만듭니다.
+
+        numbering.add_num()은 호출마다 w:num 전체를 훑으므로, abstractNumId와 다음 numId를 직접 관리합니다.
+        """
+        numbering = self.doc.part.numbering_part.element
+        abstract_num_id = self._abstract_num_ids.get(style_name)
+        if abstract_num_id is None:
+            style_num_id = self.doc.styles[style_name].element.pPr.numPr.numId.val
+            abstract_num_id = numbering.num_having_numId(style_num_id).abstractNumId.val
+            self._abstract_num_ids[style_name] = abstract_num_id
+        if self._next_num_id is None:
+            self._next_num_id = max((int(num_id) for num_id in numbering.xpath('./w:num/@w:numId')), default=0) + 1
+        num_id = self._next_num_id
+        self._next_num_id += 1
+        num = parse_xml(
+            f'<w:num {nsdecls("w")} w:numId="{num_id}"><w:abstractNumId w:val="{abstract_num_id}"/>'
+            f'<w:lvlOverride w:ilvl="0"><w:startOverride w:val="{start}"/></w:lvlOverride></w:num>'
+        )
+        # w:num은 w:numIdMacAtCleanup 앞에 와야 함
+        try:
+            last_child = numbering[-1]
+        except IndexError:
+            last_child = None
+        if last_child is not None and last_child.tag == qn('w:numIdMacAtCleanup'):
+            last_child.addprevious(num)
+        else:
+            numbering.append(num)
+        return num_id
+    
+    def _style_id(self, style_name: str) -> str:
+        """스타일 이름에 해당하는 스타일 ID를 반환합니다. (변환마다 한 번만 조회)"""
+        style_id = self._style_ids.get(style_name)
+        if style_id is None:
+            style_id = self._style_ids[style_name] = self.doc.styles[style_name].style_id
+        return style_id
+    
+    def _add_styled_paragraph(self, style_name: Optional[str], text: str, num_id: Optional[int] = None) -> Paragraph:
+        """스타일과 인라인 서식이 적용된 문단을 XML로 한 번에 만들어 추가합니다. (style_name이 None이면 기본 문단)
+
+        doc.add_paragraph(style=...)/add_heading()은 호출마다 스타일 이름을 조회하고 본문 끝을 찾으므로 긴 문서에서 느립니다.
+        """
+        style = f'<w:pStyle w:val="{self._style_id(style_name)}"/>' if style_name is not None else ''
+        num_pr = f'<w:numPr><w:ilvl w:val="0"/><w:numId w:val="{num_id}"/></w:numPr>' if num_id is not None else ''
+        p = parse_xml(
+            f'<w:p {nsdecls("w", "r")}><w:pPr>{style}{num_pr}</w:pPr>'
+            f'{self._inline_runs_xml(text)}</w:p>'
+        )
+        self._append_body_element(p)
+        return Paragraph(p, self.doc)
+    
+    def _add_centered_paragraph(self, runs_xml: str) -> Paragraph:
+        """주어진 run XML로 가운데 정렬 문단을 만들어 추가합니다."""
+        p = parse_xml(f'<w:p {nsdecls("w")}><w:pPr><w:jc w:val="center"/></w:pPr>{runs_xml}</w:p>')
+        self._append_body_element(p)
+        return Paragraph(p, self.doc)
+    
+    def _append_body_element(self, element):
+        """본문 끝(섹션 속성 앞)에 블록 요소를 추가합니다."""
+        body = self.doc.element.body
+        # sectPr은 항상 본문의 마지막 자식이므로 마지막 요소만 확인 (body.sectPr은 자식 전체를 훑음)
+        try:
+            last_child = body[-1]
+        except IndexError:
+            last_child = None
+        if last_child is not None and last_child.tag == qn('w:sectPr'):
+            last_child.addprevious(element)
+        else:
+            body.append(element)
+    
+    def _add_horizontal_rule(self):
+        """아래쪽 테두리가 있는 빈 문단으로 구분선을 추가합니다."""
+        self._append_body_element(parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr><w:pBdr>'
+            '<w:bottom w:val="single" w:sz="6" w:space="1" w:color="auto"/>'
+            '</w:pBdr></w:pPr></w:p>'
+        ))
+    
+    def _get_code_style_id(self) -> str:
+        """코드 블록용 문단 스타일을 (없으면 만들어서) 반환합니다."""
+        try:
+            return self.doc.styles[CODE_BLOCK_STYLE].style_id
+        except KeyError:
+            style = self.doc.styles.add_style(CODE_BLOCK_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+            style.base_style = self.doc.styles['No Spacing']
+            style.font.name = CODE_FONT
+            style.font.size = Pt(9)
+            style.element.get_or_add_pPr().append(parse_xml(
+                f'<w:shd {nsdecls("w")} w:val="clear" w:color="auto" w:fill="{CODE_SHADING}"/>'
+            ))
+            return style.style_id
+    
+    def _add_code_block(self, code_lines: List[str]):
+        """코드 블록을 줄바꿈으로 이어진 고정폭 문단 하나로 추가합니다."""
+        style_id = self._get_code_style_id()
+        runs = '<w:r><w:br/></w:r>'.join(
+            f'<w:r><w:t xml:space="preserve">{_xml_text(code_line.replace(chr(9), "    "))}</w:t></w:r>'
+            for code_line in code_lines
+        )
+        self._append_body_element(parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>{runs}</w:p>'
+        ))
+    
+    def _split_table_row(self, line: str) -> List[str]:
+        """표 행을 셀 문자열 목록으로 나눕니다. (\\|는 셀 구분자로 보지 않음)"""
+        line = line.strip()
+        if line.startswith('|'):
+            line = line[1:]
+        if line.endswith('|') and not line.endswith('\\|'):
+            line = line[:-1]
+        return [cell.strip().replace('\\|', '|') for cell in re.split(r'(?<!\\)\|', line)]
+    
+    def _parse_table_alignment(self, separator_cell: str) -> Optional[str]:
+        """구분선 셀(:---, :---:, ---:)에서 정렬을 읽습니다."""
+        if separator_cell.startswith(':') and separator_cell.endswith(':'):
+            return 'center'
+        if separator_cell.endswith(':'):
+            return 'right'
+        if separator_cell.startswith(':'):
+            return 'left'
+        return None
+    
+    def _add_table(self, header_cells: List[str], alignments: List[Optional[str]], body_rows: List[List[str]]):
+        """마크다운 표를 DOCX 표로 추가합니다.
+
+        python-docx의 add_row()/cell() 접근은 행이 늘수록 느려지므로,
+        표 전체 XML을 문자열로 만든 뒤 한 번에 파싱해서 삽입합니다.
+        """
+        column_count = len(header_cells)
+        alignments = (alignments + [None] * column_count)[:column_count]
+        
+        section = self.doc.sections[-1]
+        table_width = (section.page_width - section.left_margin - section.right_margin) // 635  # EMU -> twips
+        column_width = table_width // column_count
+        
+        try:
+            table_style = f'<w:tblStyle w:val="{self.doc.styles["Table Grid"].style_id}"/>'
+        except KeyError:
+            table_style = ''
+        
+        def row_xml(cells: List[str], is_header: bool) -> str:
+            cells = (cells + [''] * column_count)[:column_count]
+            parts = ['<w:tr>']
+            if is_header:
+                parts.append('<w:trPr><w:tblHeader/></w:trPr>')
+            for cell_text, alignment in zip(cells, alignments):
+                parts.append(f'<w:tc><w:tcPr><w:tcW w:w="{column_width}" w:type="dxa"/>')
+                if is_header:
+                    parts.append(f'<w:shd w:val="clear" w:color="auto" w:fill="{TABLE_HEADER_SHADING}"/>')
+                parts.append('</w:tcPr><w:p><w:pPr><w:spacing w:after="0"/>')
+                if alignment:
+                    parts.append(f'<w:jc w:val="{alignment}"/>')
+                parts.append('</w:pPr>')
+                parts.append(self._inline_runs_xml(cell_text, bold=is_header))
+                parts.append('</w:p></w:tc>')
+            parts.append('</w:tr>')
+            return ''.join(parts)
+        
+        table_xml = ''.join([
+            f'<w:tbl {nsdecls("w", "r")}>',
+            f'<w:tblPr>{table_style}<w:tblW w:w="{table_width}" w:type="dxa"/><w:tblLook w:val="04A0"/></w:tblPr>',
+            '<w:tblGrid>', f'<w:gridCol w:w="{column_width}"/>' * column_count, '</w:tblGrid>',
+            row_xml(header_cells, is_header=True),
+            ''.join(row_xml(cells, is_header=False) for cells in body_rows),
+            '</w:tbl>',
+        ])
+        self._append_body_element(parse_xml(table_xml))
+        logger.info(f"표 추가 완료: {column_count}열 x {len(body_rows) + 1}행")
+    
+    def _separate_adjacent_tables(self):
+        """연속된 표는 Word에서 하나로 합쳐지고 본문 마지막 표 뒤에는 문단이 필요하므로, 그 자리에만 빈 문단을 넣습니다."""
+        body = self.doc.element.body
+        tbl_tag = qn('w:tbl')
+        for child in list(body):
+            if child.tag != tbl_tag:
+                continue
+            next_child = child.getnext()
+            if next_child is None or next_child.tag in (tbl_tag, qn('w:sectPr')):
+                child.addnext(parse_xml(f'<w:p {nsdecls("w")}/>'))
+    
+    def _parse_inline(self, text: str, bold: bool = False) -> List[Tuple[str, dict]]:
+        """인라인 마크다운을 (텍스트, 서식) 조각 목록으로 나눕니다.
+
+        백슬래시 이스케이프(\\*, \\_ 등)는 서식 기호로 읽지 않고 문자 그대로 남깁니다. (코드 안에서는 백슬래시 유지)
+        """
+        escaped = INLINE_ESCAPE_PATTERN.sub(lambda m: chr(INLINE_ESCAPE_BASE + ord(m.group(1))), text)
+        
+        def unescape(value: str, keep_backslash: bool = False) -> str:
+            prefix = '\\' if keep_backslash else ''
+            return INLINE_ESCAPED_PATTERN.sub(lambda m: prefix + chr(ord(m.group(0)) - INLINE_ESCAPE_BASE), value)
+        
+        segments = []
+        for segment_text, fmt in self._parse_inline_segments(escaped, bold, False, False, None):
+            if fmt['link']:
+                fmt['link'] = unescape(fmt['link'])
+            segments.append((unescape(segment_text, keep_backslash=fmt['code']), fmt))
+        return segments
+    
+    def _parse_inline_segments(self, text: str, bold: bool, italic: bool, strike: bool,
+                               link: Optional[str]) -> List[Tuple[str, dict]]:
+        """_parse_inline의 재귀 파서 (이스케이프 처리된 텍스트를 받음)"""
+        segments = []
+        position = 0
+        for match in INLINE_PATTERN.finditer(text):
+            if match.start() > position:
+                segments.append((text[position:match.start()], dict(bold=bold, italic=italic, strike=strike, code=False, link=link)))
+            (strong_emphasis, strong_emphasis_alt, strong, strong_alt, strike_text, code,
+             link_text, link_url, emphasis, emphasis_alt) = match.groups()
+            if strong_emphasis is not None or strong_emphasis_alt is not None:
+                inner = strong_emphasis if strong_emphasis is not None else strong_emphasis_alt
+                segments.extend(self._parse_inline_segments(inner, True, True, strike, link))
+            elif strong is not None or strong_alt is not None:
+                segments.extend(self._parse_inline_segments(strong if strong is not None else strong_alt, True, italic, strike, link))
+            elif strike_text is not None:
+                segments.extend(self._parse_inline_segments(strike_text, bold, italic, True, link))
+            elif code is not None:
+                segments.append((code, dict(bold=bold, italic=italic, strike=strike, code=True, link=link)))
+            elif link_text is not None:
+                segments.extend(self._parse_inline_segments(link_text, bold, italic, strike, link_url.strip()))
+            else:
+                segments.extend(self._parse_inline_segments(emphasis if emphasis is not None else emphasis_alt, bold, True, strike, link))
+            position = match.end()
+        if position < len(text):
+            segments.append((text[position:], dict(bold=bold, italic=italic, strike=strike, code=False, link=link)))
+        return segments
+    
+    def _add_relationship(self, reltype: str, target, is_external: bool = False) -> str:
+        """본문 파트에 관계를 추가하고 관계 ID를 반환합니다.
+
+        part.relate_to()는 호출마다 기존 관계 전체에서 같은 대상과 빈 rId를 찾으므로,
+        중복은 호출자의 캐시로 막고 rId 번호는 직접 이어서 매깁니다.
+        """
+        rels = self.doc.part.rels
+        while f"rId{self._next_rel_number}" in rels:
+            self._next_rel_number += 1
+        rel_id = f"rId{self._next_rel_number}"
+        rels.add_relationship(reltype, target, rel_id, is_external=is_external)
+        return rel_id
+    
+    def _hyperlink_rel_id(self, url: str) -> str:
+        """외부 링크 관계 ID를 반환합니다. (같은 URL은 재사용)"""
+        rel_id = self._hyperlink_rel_ids.get(url)
+        if rel_id is None:
+            rel_id = self._hyperlink_rel_ids[url] = self._add_relationship(RT.HYPERLINK, url, is_external=True)
+        return rel_id
+    
+    def _inline_runs_xml(self, text: str, bold: bool = False) -> str:
+        """인라인 마크다운을 w:r / w:hyperlink XML 문자열로 변환합니다."""
+        parts = []
+        for segment_text, fmt in self._parse_inline(text, bold=bold):
+            if not segment_text:
+                continue
+            run_properties = []
+            if fmt['code']:
+                run_properties.append(f'<w:rFonts w:ascii="{CODE_FONT}" w:hAnsi="{CODE_FONT}" w:cs="{CODE_FONT}"/>')
+            if fmt['bold']:
+                run_properties.append('<w:b/>')
+            if fmt['italic']:
+                run_properties.append('<w:i/>')
+            if fmt['strike']:
+                run_properties.append('<w:strike/>')
+            if fmt['link']:
+                run_properties.append(f'<w:color w:val="{HYPERLINK_COLOR}"/><w:u w:val="single"/>')
+            if fmt['code']:
+                run_properties.append(f'<w:shd w:val="clear" w:color="auto" w:fill="{CODE_SHADING}"/>')
+            run = (f'<w:r><w:rPr>{"".join(run_properties)}</w:rPr>'
+                   f'<w:t xml:space="preserve">{_xml_text(segment_text)}</w:t></w:r>')
+            if fmt['link']:
+                run = f'<w:hyperlink r:id="{self._hyperlink_rel_id(fmt["link"])}" w:history="1">{run}</w:hyperlink>'
+            parts.append(run)
+        return ''.join(parts)
+    
+    def _append_inline_runs(self, paragraph, text: str):
+        """인라인 서식(굵게, 기울임, 취소선, 코드, 링크)을 적용한 run들을 문단에 추가합니다."""
+        fragment = parse_xml(f'<w:p {nsdecls("w", "r")}>{self._inline_runs_xml(text)}</w:p>')
+        for child in list(fragment):
+            paragraph._p.append(child)
+    
+    def convert_markdown_to_docx(self, markdown_text: str, output_path: str | None, save_images_to_disk: bool) -> Optional[io.BytesIO]:
+        """마크다운을 DOCX로 변환합니다.
+        output_path가 제공되면 파일로 저장하고, 그렇지 않으면 BytesIO 객체를 반환합니다.
+        """
+        try:
+            self.build_document(markdown_text, save_images_to_disk)
             
             # DOCX 파일 저장 또는 BytesIO 반환
             if output_path:
@@ -397,22 +1068,107 @@ class MarkdownToDocxConverter:
                 logger.info("DOCX 데이터를 BytesIO 객체로 반환합니다.")
                 return doc_buffer
             
+        except MemoryLimitExceeded as e:
+            logger.error(f"변환 중단 (메모리 상한 초과): {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"변환 중 오류 발생: {str(e)}")
             return None
+        finally:
+            self.cleanup()
+    
+    def stream_markdown_to_docx(self, markdown_text: str, save_images_to_disk: bool = False) -> Iterator[bytes]:
+        """마크다운을 DOCX로 변환하고, zip 패키지를 청크 단위로 내보내는 이터레이터를 반환합니다.
+
+        문서 구성과 패키지 준비는 호출 시점에 끝나므로 변환 오류(MemoryLimitExceeded 포함)는 여기서 발생하고,
+        응답 전송이 시작된 뒤에는 파트 직렬화만 남습니다. 임시 파일은 이터레이터가 끝날 때 삭제되지만,
+        이터레이터가 시작되지 않고 버려질 수 있으므로 호출자도 cleanup()을 호출해야 합니다. (여러 번 호출해도 안전)
+        """
+        try:
+            self.build_document(markdown_text, save_images_to_disk)
+            content_types_blob = self._content_types_blob()
+            if content_types_blob is not None:
+                return self._iter_docx_chunks(content_types_blob)
+            
+            # 스트리밍 직렬화를 쓸 수 없으면 공개 API(doc.save)로 임시 파일에 저장한 뒤 전송
+            docx_file = tempfile.SpooledTemporaryFile(max_size=STREAM_CHUNK_SIZE, dir=self._get_spool_dir())
+            self.doc.save(docx_file)
+            docx_file.seek(0)
+            return self._iter_file_chunks(docx_file)
+        except Exception:
+            self.cleanup()
+            raise
+    
+    def _content_types_blob(self) -> Optional[bytes]:
+        """스트리밍 직렬화에 필요한 [Content_Types].xml을 만듭니다.
+
+        python-docx 내부 API(_ContentTypesItem)를 쓰는 유일한 곳이며,
+        사용할 수 없는 버전이면 None을 반환하여 doc.save() 경로로 대체합니다.
+        """
+        try:
+            from docx.opc.pkgwriter import _ContentTypesItem
+            parts = list(self.doc.part.package.parts)
+            for part in parts:
+                part.before_marshal()
+            return _ContentTypesItem.from_parts(parts).blob
+        except Exception as e:
+            logger.warning(f"DOCX 스트리밍 직렬화를 사용할 수 없어 doc.save()로 대체합니다: {str(e)}")
+            return None
+    
+    def _iter_file_chunks(self, docx_file) -> Iterator[bytes]:
+        """저장된 DOCX 파일을 청크 단위로 내보냅니다."""
+        try:
+            with docx_file:
+                while True:
+                    chunk = docx_file.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            logger.info("DOCX 전송 완료")
+        finally:
+            self.cleanup()
+    
+    def _iter_docx_chunks(self, content_types_blob: bytes) -> Iterator[bytes]:
+        """self.doc 패키지를 zip으로 직렬화하며 청크를 순서대로 생성합니다.
+
+        docx.opc.pkgwriter.PackageWriter와 같은 순서로 파트를 기록하되,
+        임시 파일에 있는 이미지 파트는 메모리에 올리지 않고 스트리밍으로 복사합니다.
+        """
+        try:
+            package = self.doc.part.package
+            
+            sink = _ZipChunkSink()
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+                zipf.writestr(CONTENT_TYPES_URI.membername, content_types_blob)
+                zipf.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+                yield sink.drain()
+                
+                for part in package.parts:
+                    if isinstance(part, _SpooledImagePart):
+                        with open(part.spool_path, 'rb') as src, zipf.open(part.partname.membername, 'w') as dst:
+                            while True:
+                                chunk = src.read(STREAM_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                dst.write(chunk)
+                                if len(sink) >= STREAM_CHUNK_SIZE:
+                                    yield sink.drain()
+                    else:
+                        zipf.writestr(part.partname.membername, part.blob)
+                    if len(part.rels):
+                        zipf.writestr(part.partname.rels_uri.membername, part.rels.xml)
+                    if len(sink) >= STREAM_CHUNK_SIZE:
+                        yield sink.drain()
+            
+            # zip 중앙 디렉터리
+            yield sink.drain()
+            logger.info("DOCX 스트리밍 전송 완료")
+        finally:
+            self.cleanup()
     
     def process_inline_formatting(self, text: str) -> str:
-        """인라인 마크다운 포맷팅을 처리합니다."""
-        # **bold** 처리
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-        # *italic* 처리
-        text = re.sub(r'\*(.*?)\*', r'\1', text)
-        # `code` 처리
-        text = re.sub(r'`(.*?)`', r'\1', text)
-        # [link](url) 처리
-        text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-        
-        return text
+        """인라인 마크다운 포맷팅을 제거한 일반 텍스트를 반환합니다."""
+        return ''.join(segment_text for segment_text, _ in self._parse_inline(text))
 
 
 def main():
@@ -422,6 +1178,7 @@ def main():
     parser.add_argument('-o', '--output', help='출력 DOCX 파일 경로 (기본값: 입력파일명.docx)')
     parser.add_argument('-v', '--verbose', action='store_true', help='상세 로그 출력')
     parser.add_argument('--save-images-to-disk', action='store_true', help='다운로드된 이미지 파일을 로컬 디스크에 저장합니다 (기본값: 저장 안 함)')
+    parser.add_argument('--memory-limit-mb', type=int, default=None, help=f'변환 메모리 상한 MB, 임시 저장 이미지 누적 크기 포함 (기본값: DOCX_MEMORY_LIMIT_MB 또는 {DEFAULT_MEMORY_LIMIT_MB})')
     
     args = parser.parse_args()
     
@@ -449,7 +1206,7 @@ def main():
         sys.exit(1)
     
     # 변환 실행
-    converter = MarkdownToDocxConverter()
+    converter = MarkdownToDocxConverter(memory_limit_mb=args.memory_limit_mb)
     success = converter.convert_markdown_to_docx(markdown_text, str(output_path), args.save_images_to_disk)
     
     if success:
@@ -0,0 +1,438 @@
+"""
+마크다운 편집기 임시 저장(draft) 저장소
+로컬 파일에 초안을 보관하고, 클라이언트가 보낸 변경분(patch)만 기록합니다.
+
+초안 하나는 두 파일로 구성됩니다.
+- <draft_id>.json: 스냅샷 (version, length, title, updated_at, content)
+- <draft_id>.log: 스냅샷 이후의 변경분을 한 줄에 하나씩 덧붙이는 저널
+
+저장은 저널에 작은 JSON 한 줄을 추가하는 것으로 끝나므로 문서 크기와 무관하게 가볍고,
+저널이 일정 크기를 넘으면 스냅샷에 합쳐서(compaction) 복원 비용을 제한합니다.
+오래 수정되지 않은 초안은 보존 기간이 지나면 삭제되고, 전체 초안 파일 크기는 DRAFT_MAX_TOTAL_BYTES로 제한됩니다.
+초안은 인스턴스의 로컬 디렉터리에 저장되므로 Cloud Run에서는 인스턴스별로 따로 있고, 인스턴스가 내려가면 사라집니다.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 초안 저장 디렉터리와 초안 1개당 최대 크기
+DEFAULT_DRAFT_STORAGE_DIR = os.environ.get('DRAFT_STORAGE_DIR', 'drafts')
+DEFAULT_DRAFT_MAX_BYTES = int(os.environ.get('DRAFT_MAX_BYTES', str(10 * 1024 * 1024)))
+# 모든 초안 파일 크기의 합계 상한 (Cloud Run에서는 저장 디렉터리도 인스턴스 메모리를 씀)
+DEFAULT_DRAFT_MAX_TOTAL_BYTES = int(os.environ.get('DRAFT_MAX_TOTAL_BYTES', str(64 * 1024 * 1024)))
+# 마지막 수정 후 이 기간이 지난 초안은 삭제
+DEFAULT_DRAFT_RETENTION_DAYS = float(os.environ.get('DRAFT_RETENTION_DAYS', '30'))
+# 보존 기간 정리 주기 (초)
+DRAFT_SWEEP_INTERVAL_SECONDS = 60 * 60
+# 저널 항목 수 또는 저널 크기가 이 값을 넘으면 스냅샷에 합침
+JOURNAL_COMPACT_ENTRIES = 200
+JOURNAL_COMPACT_MIN_BYTES = 256 * 1024
+# 메모리에 유지할 초안 상태 수 (LRU)와 초안 잠금 개수 (초안 ID 해시로 나눠 씀)
+MAX_CACHED_STATES = 1024
+LOCK_STRIPES = 64
+MAX_TITLE_LENGTH = 255
+
+DRAFT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class DraftError(Exception):
+    """초안 요청이 잘못되었을 때 발생하는 예외"""
+
+
+class DraftNotFound(DraftError):
+    """초안이 없을 때 발생하는 예외"""
+
+
+class DraftConflict(DraftError):
+    """클라이언트의 기준 버전이 서버와 다를 때 발생하는 예외"""
+
+    def __init__(self, message: str, version: int):
+        super().__init__(message)
+        self.version = version
+
+
+class DraftTooLarge(DraftError):
+    """초안이 최대 크기를 넘을 때 발생하는 예외"""
+
+
+class DraftStorageFull(DraftError):
+    """전체 초안 저장 용량이 상한에 도달했을 때 발생하는 예외"""
+
+
+def _encode_utf8(text: str) -> bytes:
+    """UTF-8로 인코딩합니다. 짝이 없는 서로게이트 문자처럼 저장할 수 없는 텍스트는 거부합니다."""
+    try:
+        return text.encode('utf-8')
+    except UnicodeEncodeError:
+        raise DraftError('저장할 수 없는 문자가 포함되어 있습니다.')
+
+
+def _validate_title(title):
+    if title is not None and (not isinstance(title, str) or len(title) > MAX_TITLE_LENGTH):
+        raise DraftError(f"제목은 {MAX_TITLE_LENGTH}자 이하의 문자열이어야 합니다.")
+
+
+class DraftStore:
+    """파일 기반 초안 저장소
+
+    최근에 사용한 초안의 버전/길이/저널 위치만 메모리에 두고 본문은 디스크에만 둡니다.
+    같은 프로세스 안의 동시 요청은 초안 ID별 잠금으로 직렬화합니다.
+    """
+
+    def __init__(self, base_dir: str = DEFAULT_DRAFT_STORAGE_DIR, max_bytes: int = DEFAULT_DRAFT_MAX_BYTES,
+                 retention_days: float = DEFAULT_DRAFT_RETENTION_DAYS,
+                 max_total_bytes: int = DEFAULT_DRAFT_MAX_TOTAL_BYTES):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.retention_seconds = retention_days * 24 * 60 * 60
+        os.makedirs(self.base_dir, exist_ok=True)
+        # 초안 수와 무관하게 잠금 개수를 고정 (초안별 잠금을 만들면 초안 수만큼 늘어남)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._states_guard = threading.Lock()
+        # draft_id -> {'version', 'length', 'bytes', 'title', 'updated_at',
+        #              'journal_entries', 'journal_bytes', 'journal_offset'}
+        self._states = OrderedDict()
+        self._last_sweep = 0.0
+        # 저장 디렉터리의 전체 파일 크기 (시작할 때 한 번 세고 이후에는 변경분으로 갱신)
+        self._usage_guard = threading.Lock()
+        self._total_bytes = sum(entry.stat().st_size for entry in os.scandir(self.base_dir) if entry.is_file())
+
+    def _lock_for(self, draft_id: str) -> threading.Lock:
+        return self._locks[zlib.crc32(draft_id.encode('ascii')) % LOCK_STRIPES]
+
+    def _snapshot_path(self, draft_id: str) -> str:
+        return os.path.join(self.base_dir, f"{draft_id}.json")
+
+    def _journal_path(self, draft_id: str) -> str:
+        return os.path.join(self.base_dir, f"{draft_id}.log")
+
+    def _validate_id(self, draft_id: str):
+        if not DRAFT_ID_PATTERN.match(draft_id or ''):
+            raise DraftError('잘못된 초안 ID입니다.')
+
+    def _get_cached_state(self, draft_id: str) -> Optional[dict]:
+        with self._states_guard:
+            state = self._states.get(draft_id)
+            if state is not None:
+                self._states.move_to_end(draft_id)
+            return state
+
+    def _cache_state(self, draft_id: str, state: dict):
+        with self._states_guard:
+            self._states[draft_id] = state
+            self._states.move_to_end(draft_id)
+            while len(self._states) > MAX_CACHED_STATES:
+                self._states.popitem(last=False)
+
+    def _drop_state(self, draft_id: str):
+        with self._states_guard:
+            self._states.pop(draft_id, None)
+
+    def _draft_paths(self, draft_id: str) -> Tuple[str, str, str]:
+        snapshot_path = self._snapshot_path(draft_id)
+        return snapshot_path, f"{snapshot_path}.tmp", self._journal_path(draft_id)
+
+    def _disk_usage(self, draft_id: str) -> int:
+        """초안 하나가 차지하는 파일 크기 합계를 반환합니다."""
+        total = 0
+        for path in self._draft_paths(draft_id):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _adjust_usage(self, delta: int):
+        with self._usage_guard:
+            self._total_bytes += delta
+
+    def _reserve_usage(self, delta: int):
+        """전체 용량에서 delta만큼 미리 예약합니다. 상한을 넘으면 DraftStorageFull을 발생시킵니다."""
+        with self._usage_guard:
+            if delta > 0 and self._total_bytes + delta > self.max_total_bytes:
+                raise DraftStorageFull('임시 저장 공간이 가득 찼습니다.')
+            self._total_bytes += delta
+
+    def _read_snapshot(self, draft_id: str) -> Optional[dict]:
+        try:
+            with open(self._snapshot_path(draft_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_journal(self, draft_id: str, after_version: int) -> Tuple[List[dict], int]:
+        """스냅샷 이후의 저널 항목과, 마지막으로 온전히 기록된 줄이 끝나는 바이트 위치를 반환합니다.
+
+        기록 도중 끊긴 줄(줄바꿈이 없거나 파싱할 수 없는 줄)에서 읽기를 멈춥니다.
+        """
+        entries = []
+        good_offset = 0
+        try:
+            with open(self._journal_path(draft_id), 'rb') as f:
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break
+                    try:
+                        entry = json.loads(raw)
+                    except ValueError:
+                        break
+                    good_offset += len(raw)
+                    if entry['v'] > after_version:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries, good_offset
+
+    def _truncate_journal(self, draft_id: str, offset: int):
+        """저널을 마지막 온전한 줄까지 잘라냅니다."""
+        try:
+            with open(self._journal_path(draft_id), 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.truncate(offset)
+        except FileNotFoundError:
+            return
+        self._adjust_usage(offset - size)
+
+    def _write_snapshot(self, draft_id: str, snapshot: dict):
+        """스냅샷을 임시 파일에 쓴 뒤 교체하여 원자적으로 저장하고 저널을 비웁니다."""
+        path = self._snapshot_path(draft_id)
+        tmp_path = f"{path}.tmp"
+        previous_usage = self._disk_usage(draft_id)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            # 스냅샷 버전 이하의 저널 항목은 읽을 때 무시되므로, 여기서 중단되어도 일관성이 유지됨
+            try:
+                os.remove(self._journal_path(draft_id))
+            except FileNotFoundError:
+                pass
+        finally:
+            self._adjust_usage(self._disk_usage(draft_id) - previous_usage)
+
+    def _state_from_snapshot(self, snapshot: dict) -> dict:
+        return {
+            'version': snapshot['version'],
+            'length': snapshot['length'],
+            'bytes': len(snapshot['content'].encode('utf-8')),
+            'title': snapshot.get('title'),
+            'updated_at': snapshot.get('updated_at'),
+            'journal_entries': 0,
+            'journal_bytes': 0,
+            'journal_offset': 0,
+        }
+
+    def _load_state(self, draft_id: str) -> Optional[dict]:
+        """초안 상태를 반환합니다. 처음 읽을 때 저널 끝의 끊긴 줄을 잘라냅니다. (잠금을 잡은 상태에서 호출)"""
+        state = self._get_cached_state(draft_id)
+        if state is not None:
+            return state
+        snapshot = self._read_snapshot(draft_id)
+        if snapshot is None:
+            return None
+        state = self._state_from_snapshot(snapshot)
+        entries, good_offset = self._read_journal(draft_id, snapshot['version'])
+        journal_path = self._journal_path(draft_id)
+        if os.path.exists(journal_path) and os.path.getsize(journal_path) > good_offset:
+            logger.warning(f"초안 저널의 끊긴 줄을 잘라냅니다: {draft_id} (offset {good_offset})")
+            self._truncate_journal(draft_id, good_offset)
+        for entry in entries:
+            insert_bytes = len(entry['i'].encode('utf-8'))
+            state['version'] = entry['v']
+            state['length'] = entry['n']
+            # 지운 부분의 바이트 수는 본문 없이 알 수 없으므로 상한값으로 누적
+            state['bytes'] += insert_bytes
+            state['title'] = entry.get('t', state['title'])
+            state['updated_at'] = entry['u']
+            state['journal_entries'] += 1
+            state['journal_bytes'] += insert_bytes
+        state['journal_offset'] = good_offset
+        self._cache_state(draft_id, state)
+        return state
+
+    def _materialize(self, draft_id: str) -> dict:
+        """스냅샷에 저널을 적용한 현재 초안을 반환합니다."""
+        snapshot = self._read_snapshot(draft_id)
+        if snapshot is None:
+            raise DraftNotFound('초안을 찾을 수 없습니다.')
+        content = snapshot['content']
+        entries, _ = self._read_journal(draft_id, snapshot['version'])
+        for entry in entries:
+            start = entry['s']
+            content = content[:start] + entry['i'] + content[start + entry['d']:]
+            snapshot['title'] = entry.get('t', snapshot.get('title'))
+            snapshot['updated_at'] = entry['u']
+            snapshot['version'] = entry['v']
+        snapshot['content'] = content
+        snapshot['length'] = len(content)
+        return snapshot
+
+    def get(self, draft_id: str) -> dict:
+        """초안을 복원합니다."""
+        self._validate_id(draft_id)
+        with self._lock_for(draft_id):
+            if self._load_state(draft_id) is None:
+                raise DraftNotFound('초안을 찾을 수 없습니다.')
+            return self._materialize(draft_id)
+
+    def put(self, draft_id: str, content: str, title: Optional[str] = None) -> int:
+        """초안 전체를 저장합니다. (첫 저장 또는 버전 충돌 후 재동기화용)"""
+        self._validate_id(draft_id)
+        _validate_title(title)
+        content_bytes = len(_encode_utf8(content))
+        if content_bytes > self.max_bytes:
+            raise DraftTooLarge(f"초안이 최대 크기({self.max_bytes} bytes)를 초과합니다.")
+        self._maybe_sweep()
+        with self._lock_for(draft_id):
+            state = self._load_state(draft_id)
+            # 새 스냅샷이 기존 파일을 대체한 뒤의 크기 증가분을 미리 예약 (실제 증감은 _write_snapshot에서 반영)
+            growth = content_bytes - self._disk_usage(draft_id)
+            self._reserve_usage(growth)
+            snapshot = {
+                'version': (state['version'] if state else 0) + 1,
+                'length': len(content),
+                'title': title,
+                'updated_at': time.time(),
+                'content': content,
+            }
+            try:
+                self._write_snapshot(draft_id, snapshot)
+            finally:
+                self._adjust_usage(-growth)
+            self._cache_state(draft_id, self._state_from_snapshot(snapshot))
+            return snapshot['version']
+
+    def apply_patch(self, draft_id: str, base_version: int, start: int, delete_count: int, insert: str,
+                    length: int, title: Optional[str] = None) -> int:
+        """변경분 하나(start 위치에서 delete_count 글자를 지우고 insert를 넣음)를 적용합니다.
+
+        보통은 본문을 읽지 않고 저널에 한 줄만 추가합니다. 위치와 길이는 유니코드 코드 포인트 기준이며,
+        length는 적용 후 전체 길이로, 클라이언트와 서버의 상태가 어긋났는지 확인하는 데 씁니다.
+        """
+        self._validate_id(draft_id)
+        _validate_title(title)
+        insert_bytes = len(_encode_utf8(insert))
+        with self._lock_for(draft_id):
+            state = self._load_state(draft_id)
+            if state is None:
+                raise DraftNotFound('초안을 찾을 수 없습니다.')
+            if base_version != state['version']:
+                raise DraftConflict('초안 버전이 일치하지 않습니다.', state['version'])
+            if start < 0 or delete_count < 0 or start + delete_count > state['length']:
+                raise DraftConflict('변경 범위가 초안 길이를 벗어났습니다.', state['version'])
+            new_length = state['length'] - delete_count + len(insert)
+            if new_length != length:
+                raise DraftConflict('변경 후 길이가 일치하지 않습니다.', state['version'])
+
+            # PUT과 같은 기준(UTF-8 바이트)으로 크기를 확인. 누적 상한값이 넘을 때만 본문으로 정확히 계산
+            new_bytes = state['bytes'] + insert_bytes
+            if new_bytes > self.max_bytes:
+                content = self._materialize(draft_id)['content']
+                new_bytes = len((content[:start] + insert + content[start + delete_count:]).encode('utf-8'))
+                if new_bytes > self.max_bytes:
+                    raise DraftTooLarge(f"초안이 최대 크기({self.max_bytes} bytes)를 초과합니다.")
+
+            version = state['version'] + 1
+            updated_at = time.time()
+            entry = {'v': version, 's': start, 'd': delete_count, 'i': insert, 'n': new_length, 'u': updated_at}
+            if title is not None:
+                entry['t'] = title
+            line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+            self._reserve_usage(len(line))
+            try:
+                with open(self._journal_path(draft_id), 'ab') as f:
+                    f.write(line)
+            except OSError:
+                # 일부만 기록된 줄이 다음 기록과 붙지 않도록 되돌리고, 상태는 디스크에서 다시 읽게 함
+                logger.error(f"초안 저널 기록 실패: {draft_id}")
+                try:
+                    written = os.path.getsize(self._journal_path(draft_id)) - state['journal_offset']
+                except FileNotFoundError:
+                    written = 0
+                # 예약분 대신 실제로 기록된 크기를 반영한 뒤 잘라냄
+                self._adjust_usage(written - len(line))
+                self._truncate_journal(draft_id, state['journal_offset'])
+                self._drop_state(draft_id)
+                raise
+
+            state.update(version=version, length=new_length, bytes=new_bytes, updated_at=updated_at)
+            if title is not None:
+                state['title'] = title
+            state['journal_entries'] += 1
+            state['journal_bytes'] += insert_bytes
+            state['journal_offset'] += len(line)
+
+            if (state['journal_entries'] >= JOURNAL_COMPACT_ENTRIES
+                    or state['journal_bytes'] >= max(JOURNAL_COMPACT_MIN_BYTES, state['bytes'])):
+                self._compact(draft_id)
+            return version
+
+    def _compact(self, draft_id: str):
+        """저널을 스냅샷에 합치고, 기록한 스냅샷으로 상태를 새로 만듭니다. (잠금을 잡은 상태에서 호출)"""
+        snapshot = self._materialize(draft_id)
+        self._write_snapshot(draft_id, snapshot)
+        self._cache_state(draft_id, self._state_from_snapshot(snapshot))
+        logger.info(f"초안 저널 압축 완료: {draft_id} (version {snapshot['version']}, {snapshot['length']} chars)")
+
+    def _delete_files(self, draft_id: str):
+        for path in self._draft_paths(draft_id):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._adjust_usage(-size)
+        self._drop_state(draft_id)
+
+    def delete(self, draft_id: str):
+        """초안을 삭제합니다."""
+        self._validate_id(draft_id)
+        with self._lock_for(draft_id):
+            self._delete_files(draft_id)
+
+    def _maybe_sweep(self):
+        """마지막 정리 후 일정 시간이 지났으면 보존 기간이 지난 초안을 정리합니다."""
+        now = time.time()
+        if now - self._last_sweep < DRAFT_SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        try:
+            self.sweep_expired(now)
+        except OSError as e:
+            logger.error(f"초안 정리 실패: {str(e)}")
+
+    def sweep_expired(self, now: Optional[float] = None) -> int:
+        """마지막 수정 후 보존 기간이 지난 초안을 삭제하고 삭제한 개수를 반환합니다."""
+        cutoff = (now or time.time()) - self.retention_seconds
+        # 스냅샷 없이 남은 저널/임시 파일도 함께 정리하도록 파일 이름에서 초안 ID를 모음
+        draft_ids = set()
+        for entry in os.scandir(self.base_dir):
+            draft_id = entry.name.split('.', 1)[0]
+            if DRAFT_ID_PATTERN.match(draft_id):
+                draft_ids.add(draft_id)
+        removed = 0
+        for draft_id in draft_ids:
+            with self._lock_for(draft_id):
+                modified = None
+                for path in self._draft_paths(draft_id):
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except FileNotFoundError:
+                        continue
+                    modified = mtime if modified is None else max(modified, mtime)
+                if modified is not None and modified < cutoff:
+                    self._delete_files(draft_id)
+                    removed += 1
+        if removed:
+            logger.info(f"보존 기간이 지난 초안 {removed}개 삭제")
+        return removed
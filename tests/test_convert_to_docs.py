@@ -0,0 +1,165 @@
+import io
+import os
+import sys
+
+import pytest
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_docs
+from convert_to_docs import MarkdownToDocxConverter, MemoryLimitExceeded
+
+
+class FakeImageResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.headers = {'Content-Type': 'image/png'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.data), chunk_size):
+            yield self.data[offset:offset + chunk_size]
+
+
+def png_bytes(size, mode='RGB') -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 255) if mode == 'RGBA' else (200, 30, 30)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def remote_images(monkeypatch):
+    """URL -> 이미지 바이트 매핑으로 원격 이미지 다운로드를 대신합니다."""
+    images = {}
+    monkeypatch.setattr(convert_to_docs.requests, 'get',
+                        lambda url, **kwargs: FakeImageResponse(images[url]))
+    return images
+
+
+def stream_to_document(converter, markdown_text):
+    data = b''.join(converter.stream_markdown_to_docx(markdown_text))
+    return Document(io.BytesIO(data))
+
+
+def test_streamed_docx_reopens_with_images(remote_images):
+    remote_images['http://img/small.png'] = png_bytes((40, 20))
+    converter = MarkdownToDocxConverter(memory_limit_mb=16)
+    doc = stream_to_document(converter, '# 제목\n\n본문\n\n![작은 그림](http://img/small.png)\n')
+
+    texts = [p.text for p in doc.paragraphs]
+    assert texts[:2] == ['제목', '본문']
+    assert '그림 1: 작은 그림' in texts
+    assert len(doc.inline_shapes) == 1
+    assert converter._spool_dir is None
+    assert converter.memory_budget.available() == converter.memory_budget.limit_bytes
+
+
+def test_image_over_memory_ceiling_becomes_placeholder(remote_images):
+    remote_images['http://img/small.png'] = png_bytes((40, 20))
+    # 1000x1000 RGBA는 디코딩에 약 11MB가 필요함
+    remote_images['http://img/huge.png'] = png_bytes((1000, 1000), mode='RGBA')
+    converter = MarkdownToDocxConverter(memory_limit_mb=4)
+    doc = stream_to_document(converter, '![큰 그림](http://img/huge.png)\n\n![작은 그림](http://img/small.png)\n')
+
+    texts = [p.text for p in doc.paragraphs]
+    assert '[이미지 추가 실패: 큰 그림]' in texts
+    assert '그림 1: 작은 그림' in texts
+    assert len(doc.inline_shapes) == 1
+
+
+def test_markdown_over_memory_ceiling_raises(monkeypatch):
+    budget = convert_to_docs.MemoryBudget(1024)
+    monkeypatch.setattr(convert_to_docs, 'PROCESS_MEMORY_BUDGET', budget)
+    converter = MarkdownToDocxConverter()
+    with pytest.raises(MemoryLimitExceeded):
+        converter.stream_markdown_to_docx('가' * 1024)
+    assert budget.available() == 1024
+
+
+def test_concurrent_conversions_share_process_budget(monkeypatch, remote_images):
+    remote_images['http://img/small.png'] = png_bytes((40, 20))
+    budget = convert_to_docs.MemoryBudget(64 * 1024)
+    monkeypatch.setattr(convert_to_docs, 'PROCESS_MEMORY_BUDGET', budget)
+    first = MarkdownToDocxConverter()
+    first_chunks = first.stream_markdown_to_docx('a' * 40 * 1024)
+    # 첫 변환이 전송을 마치기 전에는 예산을 나눠 씀
+    with pytest.raises(MemoryLimitExceeded):
+        MarkdownToDocxConverter().stream_markdown_to_docx('b' * 40 * 1024)
+    b''.join(first_chunks)
+    second = MarkdownToDocxConverter()
+    second.stream_markdown_to_docx('b' * 40 * 1024).close()
+    second.cleanup()
+    assert budget.available() == budget.limit_bytes
+
+
+def test_cleanup_when_stream_is_never_started(remote_images):
+    remote_images['http://img/small.png'] = png_bytes((40, 20))
+    converter = MarkdownToDocxConverter(memory_limit_mb=16)
+    chunks = converter.stream_markdown_to_docx('![그림](http://img/small.png)')
+    spool_dir = converter._spool_dir
+    assert os.path.isdir(spool_dir)
+
+    chunks.close()
+    converter.cleanup()
+    assert not os.path.exists(spool_dir)
+    assert converter.memory_budget.available() == converter.memory_budget.limit_bytes
+
+
+def test_table_cells_and_alignment():
+    doc = stream_to_document(MarkdownToDocxConverter(), '| 이름 | 값 |\n|:---|---:|\n| a | **1** |\n| b \\| c | 2 |\n')
+
+    table = doc.tables[0]
+    assert [[cell.text for cell in row.cells] for row in table.rows] == [['이름', '값'], ['a', '1'], ['b | c', '2']]
+    assert [cell.paragraphs[0].alignment for cell in table.rows[1].cells] == [WD_ALIGN_PARAGRAPH.LEFT, WD_ALIGN_PARAGRAPH.RIGHT]
+    assert table.rows[0].cells[0].paragraphs[0].runs[0].bold
+    # 본문 마지막 표 뒤에는 빈 문단이 있어야 함
+    assert doc.element.body[-2].tag == qn('w:p')
+
+
+def test_heading_with_pipe_is_not_a_table():
+    doc = stream_to_document(MarkdownToDocxConverter(), '# a | b\n|---|---|\n')
+    assert not doc.tables
+    assert doc.paragraphs[0].style.name == 'Heading 1'
+    assert doc.paragraphs[0].text == 'a | b'
+
+
+def test_list_styles_and_start_override():
+    doc = stream_to_document(MarkdownToDocxConverter(), '3. 셋\n4. 넷\n   - 하위\n\n문단\n\n1. 다시\n')
+    items = [(p.text, p.style.name) for p in doc.paragraphs if p.style.name.startswith('List')]
+    assert items == [('셋', 'List Number'), ('넷', 'List Number'), ('하위', 'List Bullet 2'), ('다시', 'List Number')]
+
+    numbered = [p for p in doc.paragraphs if p.style.name == 'List Number']
+    num_ids = [p._p.pPr.numPr.numId.val for p in numbered]
+    assert num_ids[0] == num_ids[1] != num_ids[2]
+    numbering = doc.part.numbering_part.element
+    starts = [numbering.num_having_numId(num_id).xpath('./w:lvlOverride/w:startOverride/@w:val')[0]
+              for num_id in (num_ids[0], num_ids[2])]
+    assert starts == ['3', '1']
+
+
+def test_inline_run_properties():
+    doc = stream_to_document(MarkdownToDocxConverter(),
+                             '**굵게** *기울임* ***둘다*** ~~취소~~ `코드` [링크](http://example.com) a \\*not\\* b\n')
+    runs = {run.text: run for run in doc.paragraphs[0].iter_inner_content() if hasattr(run, 'bold')}
+    assert runs['굵게'].bold and not runs['굵게'].italic
+    assert runs['기울임'].italic and not runs['기울임'].bold
+    assert runs['둘다'].bold and runs['둘다'].italic
+    assert runs['취소'].font.strike
+    assert runs['코드'].font.name == 'Consolas'
+    assert ' a *not* b' in runs
+
+    hyperlink = doc.paragraphs[0].hyperlinks[0]
+    assert hyperlink.text == '링크'
+    assert hyperlink.address == 'http://example.com'
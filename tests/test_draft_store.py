@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import draft_store
+from draft_store import DraftError, DraftStorageFull, DraftStore, DraftTooLarge
+
+DRAFT_ID = 'draft-0001'
+
+
+def patch_append(store, text):
+    draft = store.get(DRAFT_ID)
+    return store.apply_patch(DRAFT_ID, draft['version'], draft['length'], 0, text, draft['length'] + len(text))
+
+
+def test_torn_journal_line_is_truncated_and_later_saves_persist(tmp_path):
+    store = DraftStore(base_dir=str(tmp_path))
+    store.put(DRAFT_ID, 'hello')
+    patch_append(store, ' world')
+    # 기록 도중 프로세스가 종료되어 줄바꿈 없이 끊긴 줄
+    with open(store._journal_path(DRAFT_ID), 'ab') as f:
+        f.write(b'{"v": 3, "s": 11, "d": 0, "i": "lo')
+
+    reopened = DraftStore(base_dir=str(tmp_path))
+    assert reopened.get(DRAFT_ID)['content'] == 'hello world'
+    patch_append(reopened, '!')
+    patch_append(reopened, '?')
+
+    restored = DraftStore(base_dir=str(tmp_path)).get(DRAFT_ID)
+    assert restored['content'] == 'hello world!?'
+    assert restored['version'] == 4
+
+
+def test_failed_journal_write_is_rolled_back(tmp_path, monkeypatch):
+    store = DraftStore(base_dir=str(tmp_path))
+    store.put(DRAFT_ID, 'abc')
+    patch_append(store, 'd')
+
+    real_open = open
+
+    class TornWriter:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def write(self, data):
+            self.f.write(data[:5])
+            raise OSError('disk full')
+
+    def failing_open(path, mode='r', *args, **kwargs):
+        f = real_open(path, mode, *args, **kwargs)
+        return TornWriter(f) if mode == 'ab' else f
+
+    monkeypatch.setattr(draft_store, 'open', failing_open, raising=False)
+    with pytest.raises(OSError):
+        patch_append(store, 'e')
+    monkeypatch.undo()
+
+    patch_append(store, 'f')
+    assert DraftStore(base_dir=str(tmp_path)).get(DRAFT_ID)['content'] == 'abcdf'
+
+
+def test_state_after_compaction_matches_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(draft_store, 'JOURNAL_COMPACT_ENTRIES', 3)
+    store = DraftStore(base_dir=str(tmp_path))
+    store.put(DRAFT_ID, '')
+    for text in ['a', 'b', 'c', 'd', 'e']:
+        patch_append(store, text)
+
+    assert store._states[DRAFT_ID]['journal_offset'] == os.path.getsize(store._journal_path(DRAFT_ID))
+    assert DraftStore(base_dir=str(tmp_path)).get(DRAFT_ID)['content'] == 'abcde'
+
+
+def test_patch_size_limit_counts_utf8_bytes(tmp_path):
+    store = DraftStore(base_dir=str(tmp_path), max_bytes=30)
+    store.put(DRAFT_ID, '가나다')
+    with pytest.raises(DraftTooLarge):
+        patch_append(store, '라마바사아자차카')
+    # 지운 만큼은 다시 쓸 수 있음
+    draft = store.get(DRAFT_ID)
+    store.apply_patch(DRAFT_ID, draft['version'], 0, 3, '가나다라마바사아자차', 10)
+    assert store.get(DRAFT_ID)['content'] == '가나다라마바사아자차'
+
+
+def test_title_must_be_short_string(tmp_path):
+    store = DraftStore(base_dir=str(tmp_path))
+    with pytest.raises(DraftError):
+        store.put(DRAFT_ID, 'x', title={'a': 1})
+    with pytest.raises(DraftError):
+        store.put(DRAFT_ID, 'x', title='t' * (draft_store.MAX_TITLE_LENGTH + 1))
+
+
+def test_sweep_removes_expired_drafts(tmp_path):
+    store = DraftStore(base_dir=str(tmp_path), retention_days=1)
+    store.put(DRAFT_ID, 'old')
+    patch_append(store, '!')
+    store.put('draft-0002', 'new')
+    past = time.time() - 2 * 24 * 60 * 60
+    for path in (store._snapshot_path(DRAFT_ID), store._journal_path(DRAFT_ID)):
+        os.utime(path, (past, past))
+
+    assert store.sweep_expired() == 1
+    assert not os.path.exists(store._journal_path(DRAFT_ID))
+    assert DRAFT_ID not in store._states
+    assert store.get('draft-0002')['content'] == 'new'
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def test_total_storage_quota(tmp_path):
+    store = DraftStore(base_dir=str(tmp_path), max_total_bytes=1024)
+    store.put(DRAFT_ID, 'a' * 400)
+    patch_append(store, 'b' * 100)
+    with pytest.raises(DraftStorageFull):
+        store.put('draft-0002', 'c' * 600)
+    assert not os.path.exists(store._snapshot_path('draft-0002'))
+    # 기존 초안을 줄이거나 지우면 다시 저장할 수 있음
+    store.delete(DRAFT_ID)
+    store.put('draft-0002', 'c' * 600)
+    assert store._total_bytes == directory_size(tmp_path)
+
+
+def test_usage_tracks_disk_across_compaction_and_repair(tmp_path, monkeypatch):
+    monkeypatch.setattr(draft_store, 'JOURNAL_COMPACT_ENTRIES', 3)
+    store = DraftStore(base_dir=str(tmp_path))
+    store.put(DRAFT_ID, '')
+    for text in ['가', 'b', 'c', 'd']:
+        patch_append(store, text)
+    assert store._total_bytes == directory_size(tmp_path)
+
+    with open(store._journal_path(DRAFT_ID), 'ab') as f:
+        f.write(b'{"v": 99')
+    reopened = DraftStore(base_dir=str(tmp_path))
+    patch_append(reopened, 'e')
+    assert reopened._total_bytes == directory_size(tmp_path)